@@ -0,0 +1,78 @@
+#%% [markdown]
+# # Functions
+# ---
+# Proforma building blocks. Submodules (and pandas with them) are only imported the first time one of
+# their names is used, so `import Functions` is cheap and a worker that only needs `Functions.payment`
+# never loads pandas.
+#
+#     from Functions import newLease, newRentRoll, amortization_table
+#     import Functions as fa; fa.core.payment(0.04 / 12, 360, 700000)
+
+import importlib
+
+#public name -> submodule it lives in
+_EXPORTS = {"newLease": "leases",
+            "newLeaseSchedule": "leases",
+            "newLeaseBatch": "leases",
+            "newRentRoll": "leases",
+            "newExpense": "leases",
+            "calculateExpenses": "leases",
+            "amortize": "finance",
+            "amortization_table": "finance",
+            "payment": "core",
+            "future_value": "core",
+            "irr": "core",
+            "lease_rent": "core",
+            "readRentRoll": "ingest",
+            "importRentRoll": "ingest",
+            "occupancyStats": "analytics",
+            "markToMarket": "analytics",
+            "rentRollSnapshot": "analytics",
+            "tenantConcentration": "analytics",
+            "newOverride": "overrides",
+            "resolveOverrides": "overrides",
+            "applyOverrides": "overrides",
+            "newRollup": "rollups",
+            "periodTotals": "rollups",
+            "windowTotal": "rollups",
+            "trailingTotals": "rollups",
+            "cumulativeTotals": "rollups",
+            "calendarTable": "rollups",
+            "dcfValuation": "valuation",
+            "escalatedRates": "escalations",
+            "leasingCosts": "leasingcosts",
+            "newPool": "recoveries",
+            "poolRecoveries": "recoveries",
+            "Portfolio": "portfolio",
+            "cashFlow": "cashflow",
+            "equityWaterfall": "cashflow",
+            "sweep": "simulation",
+            "MetricSummary": "simulation",
+            "rollForecast": "forecast",
+            "closeMonth": "forecast",
+            "appendActuals": "forecast",
+            "loadActuals": "forecast",
+            "loadProperty": "proforma",
+            "findProperties": "proforma",
+            "runProforma": "proforma",
+            "writeProforma": "proforma"}
+
+_SUBMODULES = ["analytics", "benchmarks", "cashflow", "cli", "core", "escalations", "finance", "forecast", "ingest", "leases", "leasingcosts", "overrides", "portfolio", "profiling", "proforma", "recoveries", "rollups", "simulation", "valuation"]
+
+__all__ = sorted(_EXPORTS) + _SUBMODULES
+
+#%%
+def __getattr__(name):
+    if name in _EXPORTS:
+        value = getattr(importlib.import_module("." + _EXPORTS[name], __name__), name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module("." + name, __name__)
+    else:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+    #cache it so the next lookup doesn't come back through here
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
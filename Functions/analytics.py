@@ -0,0 +1,154 @@
+#%%
+import numpy as np
+import pandas as pd
+
+try:
+    from . import core
+except ImportError:
+    import core
+
+#%% [markdown]
+# # Rent Roll Analytics
+# ---
+# Occupancy, lease term and rent statistics computed over the whole rent roll at once. Every figure is a
+# grouped reduction over the full table (bincount on the month position, or a pandas groupby), so the
+# same code works for one building or a portfolio of 100k leases.
+#
+# * **_occupancyStats_**: month by month leased SF, occupancy %, lease count, in-place rent PSF,
+#   weighted average lease term remaining (WALT) and tenant concentration
+# * **_markToMarket_**: month by month in-place rent against a market rent (flat PSF or a curve)
+# * **_rentRollSnapshot_**: one row per lease in place on a date, with term remaining and market gap
+# * **_tenantConcentration_**: share of rent by tenant over a window
+
+#%%
+#month positions of every row of the full rent roll, and the continuous months they index into
+def _months(full):
+    periods = core.period(full.index.values)
+    first = periods.min()
+    return core.CALENDAR.month[first:periods.max() + 1], periods - first
+
+def _monthIndex(months):
+    return pd.DatetimeIndex(months.astype("datetime64[D]"), name="month") + pd.offsets.MonthEnd(0)
+
+#%%
+#months left on each row's lease counting the row's own month, a tenant renewing in the same suite
+#(back to back newLease calls) counts as one lease
+def _monthsRemaining(full, position, tenant=None):
+    if tenant is None:
+        tenant = pd.factorize(full["tenantName"])[0]
+    suite = pd.factorize(full["suite"])[0]
+    lease = tenant.astype(np.int64) * (suite.max() + 1) + suite
+    last = pd.Series(position).groupby(lease).transform("max").values
+    return last - position + 1
+
+#%%
+#market rent PSF for every month, market_rent_psf is a flat rate or a Series of rates by date
+def _marketRate(market_rent_psf, months):
+    if np.isscalar(market_rent_psf):
+        return np.full(len(months), float(market_rent_psf))
+    curve = pd.Series(market_rent_psf)
+    curve = pd.Series(curve.values, index=pd.to_datetime(curve.index).values.astype("datetime64[M]"))
+    curve = curve.groupby(level=0).last()
+
+    #each month takes the latest rate on or before it, months before the curve starts take its first rate
+    latest = np.searchsorted(curve.index.values.astype("datetime64[M]"), months, side="right") - 1
+    return curve.values[np.clip(latest, 0, None)]
+
+#%%
+#walt_weight is "sf" (weighted by occupied SF) or "rent" (weighted by collected rent)
+def occupancyStats(rent_roll, building_size, walt_weight="sf"):
+    full = rent_roll.full if hasattr(rent_roll, "full") else rent_roll
+    months, position = _months(full)
+    count = len(months)
+
+    sf = full["occupiedSF"].values
+    rent = full["collectedRent"].values
+    leased = np.bincount(position, weights=sf, minlength=count)
+    leases = np.bincount(position, minlength=count)
+
+    tenant = pd.factorize(full["tenantName"])[0]
+    weight = sf if walt_weight == "sf" else rent
+    remaining = _monthsRemaining(full, position, tenant)
+    total_weight = np.bincount(position, weights=weight, minlength=count)
+
+    #rent by tenant and month, squared shares summed by month give the Herfindahl index
+    cell_position, cell = pd.factorize(position.astype(np.int64) * (tenant.max() + 1) + tenant)
+    cell_rent = np.bincount(cell_position, weights=rent)
+    cell_month = (cell // (tenant.max() + 1)).astype(int)
+    month_rent = np.bincount(cell_month, weights=cell_rent, minlength=count)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        share = np.where(month_rent[cell_month] > 0, cell_rent / month_rent[cell_month], 0)
+        stats = pd.DataFrame({"leasedSF": leased,
+                              "occupancy": leased / building_size,
+                              "leaseCount": leases,
+                              "inPlaceRentPSF": np.where(leased > 0, np.bincount(position, weights=full["rentalRate"].values * sf, minlength=count) / leased, 0),
+                              "waltYears": np.where(total_weight > 0, np.bincount(position, weights=weight * remaining, minlength=count) / total_weight / 12, 0),
+                              "topTenantShare": pd.Series(share).groupby(cell_month).max().reindex(range(count), fill_value=0).values,
+                              "hhi": np.bincount(cell_month, weights=share ** 2, minlength=count)},
+                             index=_monthIndex(months))
+
+    return stats.round(4)
+
+#%%
+#in-place annual rent against market annual rent for the leased SF in each month
+def markToMarket(rent_roll, market_rent_psf):
+    full = rent_roll.full if hasattr(rent_roll, "full") else rent_roll
+    months, position = _months(full)
+    count = len(months)
+
+    sf = full["occupiedSF"].values
+    market = _marketRate(market_rent_psf, months)
+
+    in_place = np.bincount(position, weights=full["rentalRate"].values * sf, minlength=count)
+    at_market = np.bincount(position, weights=market[position] * sf, minlength=count)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        table = pd.DataFrame({"marketRentPSF": market,
+                              "inPlaceRent": in_place,
+                              "marketRent": at_market,
+                              "markToMarket": at_market - in_place,
+                              "markToMarketPct": np.where(in_place > 0, at_market / in_place - 1, 0)},
+                             index=_monthIndex(months))
+
+    return table.round(4)
+
+#%%
+#every lease in place in the month of as_of
+def rentRollSnapshot(rent_roll, as_of, market_rent_psf=None):
+    full = rent_roll.full if hasattr(rent_roll, "full") else rent_roll
+    months, position = _months(full)
+
+    remaining = _monthsRemaining(full, position)
+    in_month = full.index.values.astype("datetime64[M]") == np.datetime64(pd.Timestamp(as_of), "M")
+
+    snapshot = pd.DataFrame({"tenantName": full["tenantName"].values[in_month],
+                             "suite": full["suite"].values[in_month],
+                             "occupiedSF": full["occupiedSF"].values[in_month],
+                             "rentalRate": full["rentalRate"].values[in_month],
+                             "annualRent": (full["rentalRate"].values * full["occupiedSF"].values)[in_month],
+                             "monthsRemaining": remaining[in_month],
+                             "expenseType": full["expenseType"].values[in_month]})
+
+    if market_rent_psf is not None:
+        snapshot["marketRentPSF"] = _marketRate(market_rent_psf, months)[position[in_month]]
+        snapshot["markToMarket"] = (snapshot["marketRentPSF"] - snapshot["rentalRate"]) * snapshot["occupiedSF"]
+
+    return snapshot.sort_values("annualRent", ascending=False).reset_index(drop=True)
+
+#%%
+#share of collected rent by tenant between two dates (the whole rent roll when no dates are given)
+def tenantConcentration(rent_roll, start=None, end=None):
+    full = rent_roll.full if hasattr(rent_roll, "full") else rent_roll
+    mask = np.ones(len(full), dtype=bool)
+    if start is not None:
+        mask &= full.index >= pd.Timestamp(start)
+    if end is not None:
+        mask &= full.index <= pd.Timestamp(end) + pd.offsets.MonthEnd(0)
+
+    rent = full["collectedRent"][mask].groupby(full["tenantName"][mask]).sum().sort_values(ascending=False)
+    table = pd.DataFrame({"rent": rent,
+                          "share": rent / rent.sum(),
+                          "cumulativeShare": rent.cumsum() / rent.sum()})
+
+    return table.round(4)
@@ -0,0 +1,217 @@
+#%%
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from datetime import date
+
+from .leases import newLease, newLeaseSchedule, newLeaseBatch, newRentRoll, calculateExpenses
+from .ingest import validateLeases
+from .finance import amortization_table
+
+#%% [markdown]
+# # Benchmarks
+# ---
+# Times and memory-profiles the lease, rent roll, expense and amortization functions across a range of
+# synthetic portfolio sizes.
+#
+#     python -m Functions.benchmarks                     # print scaling curves
+#     python -m Functions.benchmarks --save-baseline     # store the results as the new baseline
+#     python -m Functions.benchmarks --check             # exit 1 if any case is slower than the baseline
+#
+# The baseline is a json file keyed by "function:size", compared on the fastest of the repeated runs.
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Outputs", "benchmark_baseline.json")
+
+SIZES = {"full": {"newLease": [12, 60, 120, 240],
+                  "newLeaseSchedule": [1, 5, 10, 20],
+                  "newLeaseBatch": [10, 100, 1000, 10000],
+                  "newRentRoll": [10, 50, 200, 1000],
+                  "calculateExpenses": [10, 50, 200, 1000],
+                  "amortization_table": [1, 5, 20, 50]},
+         "quick": {"newLease": [12, 120],
+                   "newLeaseSchedule": [1, 10],
+                   "newLeaseBatch": [10, 1000],
+                   "newRentRoll": [10, 100],
+                   "calculateExpenses": [10, 100],
+                   "amortization_table": [1, 10]}}
+
+#%%
+#synthetic lease table in the same layout as a property's leases.csv (see proforma.py). With escalations
+#every lease runs through 12/31 of its start year + escalations, so it has exactly that many rent steps
+#(increases come every 1/1 after the start year), otherwise it runs term_months
+def syntheticLeases(lease_count, term_months=120, escalations=0, seed=0):
+    rng = np.random.RandomState(seed)
+    start_month = rng.randint(0, 36, lease_count)
+    start_day = rng.randint(1, 29, lease_count)
+
+    starts = [date(2018 + int(m) // 12, int(m) % 12 + 1, int(d)) for m, d in zip(start_month, start_day)]
+    if escalations:
+        ends = [date(s.year + escalations, 12, 31) for s in starts]
+    else:
+        ends = [(pd.Timestamp(s) + pd.DateOffset(months=term_months) - pd.DateOffset(days=1)).date() for s in starts]
+
+    leases = pd.DataFrame({"start_date": starts,
+                           "end_date": ends,
+                           "tenant_name": ["Tenant %d" % i for i in range(lease_count)],
+                           "suite": [str(100 + i) for i in range(lease_count)],
+                           "rental_rate_psf": rng.uniform(12, 35, lease_count).round(2),
+                           "occupied_sf": rng.randint(800, 12000, lease_count).astype(float),
+                           "expense_type": np.where(rng.rand(lease_count) < 0.7, "NNN", "BASE YEAR"),
+                           "percent_increase": 0.03 if escalations else 0.0})
+    return leases
+
+#%%
+#synthetic loan terms in the same layout as a property's loan.csv
+def syntheticLoans(loan_count, years=30, seed=0):
+    rng = np.random.RandomState(seed)
+    loans = pd.DataFrame({"principal": rng.randint(100, 5000, loan_count) * 1000.0,
+                          "interest_rate": rng.uniform(0.03, 0.07, loan_count).round(4),
+                          "years": years,
+                          "addl_principal": rng.choice([0, 50, 200], loan_count),
+                          "start_date": date(2016, 1, 1)})
+    return loans
+
+#%%
+def _leaseSchedules(leases):
+    return [newLease(l.start_date, l.end_date, l.tenant_name, l.suite, l.rental_rate_psf,
+                     l.occupied_sf, l.expense_type).schedule
+            for l in leases.itertuples(index=False)]
+
+#%%
+#each case returns (setup, run) so only the function being measured is timed
+def _cases(name, size):
+    if name == "newLease":
+        lease = syntheticLeases(1, term_months=size).iloc[0]
+        return lambda: None, lambda _: newLease(lease.start_date, lease.end_date, lease.tenant_name, lease.suite,
+                                                 lease.rental_rate_psf, lease.occupied_sf, lease.expense_type)
+    if name == "newLeaseSchedule":
+        lease = syntheticLeases(1, escalations=size).iloc[0]
+        return lambda: None, lambda _: newLeaseSchedule(lease.start_date, lease.end_date, lease.tenant_name,
+                                                         lease.suite, lease.rental_rate_psf, lease.occupied_sf,
+                                                         lease.expense_type, lease.percent_increase)
+    if name == "newLeaseBatch":
+        leases = syntheticLeases(size).rename(columns={"tenant_name": "tenantName", "occupied_sf": "occupiedSF",
+                                                       "rental_rate_psf": "rentalRate", "expense_type": "expenseType",
+                                                       "start_date": "startDate", "end_date": "endDate",
+                                                       "percent_increase": "percentIncrease"})
+        leases = validateLeases(leases)[0]
+        return lambda: None, lambda _: newLeaseBatch(leases)
+    if name == "newRentRoll":
+        leases = syntheticLeases(size)
+        return lambda: _leaseSchedules(leases), lambda schedules: newRentRoll(schedules)
+    if name == "calculateExpenses":
+        leases = syntheticLeases(size)
+        building_size = leases["occupied_sf"].sum() * 1.1
+        return (lambda: newRentRoll(_leaseSchedules(leases)),
+                lambda rentRoll: calculateExpenses(rentRoll, 45000, building_size))
+    if name == "amortization_table":
+        loans = syntheticLoans(size)
+        return lambda: None, lambda _: [amortization_table(l.principal, l.interest_rate, l.years,
+                                                           addl_principal=l.addl_principal, start_date=l.start_date)
+                                        for l in loans.itertuples(index=False)]
+    raise ValueError("unknown benchmark %s" % name)
+
+#%%
+def measure(name, size, repeats=3):
+    setup, run = _cases(name, size)
+
+    times = []
+    for _ in range(repeats):
+        data = setup()
+        started = time.perf_counter()
+        run(data)
+        times.append(time.perf_counter() - started)
+
+    #memory is measured on a separate run because tracemalloc slows everything down
+    data = setup()
+    tracemalloc.start()
+    run(data)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {"function": name, "size": size, "best": min(times), "median": float(np.median(times)), "peakMB": peak / 2**20}
+
+#%%
+def runBenchmarks(names=None, sizes="full", repeats=3):
+    results = []
+    for name, name_sizes in SIZES[sizes].items():
+        if names and name not in names:
+            continue
+        for size in name_sizes:
+            results.append(measure(name, size, repeats))
+    return pd.DataFrame(results)
+
+#%%
+#log-log slope between each size and the previous one, ~1 means linear scaling, ~2 quadratic
+def scalingCurves(results):
+    results = results.sort_values(["function", "size"]).copy()
+    grouped = results.groupby("function")
+    results["exponent"] = (np.log(results["best"]) - np.log(grouped["best"].shift())) / \
+                          (np.log(results["size"]) - np.log(grouped["size"].shift()))
+    results["perUnit (ms)"] = results["best"] / results["size"] * 1000
+    return results
+
+#%%
+def saveBaseline(results, path=DEFAULT_BASELINE):
+    baseline = {"%s:%d" % (row.function, row.size): {"best": row.best, "peakMB": row.peakMB}
+                for row in results.itertuples(index=False)}
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+
+#%%
+#returns the cases slower than the baseline by more than threshold (0.25 = 25% slower)
+def compareBaseline(results, path=DEFAULT_BASELINE, threshold=0.25):
+    with open(path) as f:
+        baseline = json.load(f)
+
+    rows = []
+    for row in results.itertuples(index=False):
+        key = "%s:%d" % (row.function, row.size)
+        if key not in baseline:
+            continue
+        change = row.best / baseline[key]["best"] - 1
+        rows.append({"function": row.function, "size": row.size, "baseline": baseline[key]["best"],
+                     "best": row.best, "change": change, "regressed": change > threshold})
+    return pd.DataFrame(rows, columns=["function", "size", "baseline", "best", "change", "regressed"])
+
+#%%
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="benchmarks", description="Benchmark the proforma hot paths.")
+    parser.add_argument("functions", nargs="*", help="only run these functions (default: all)")
+    parser.add_argument("--quick", action="store_true", help="run the small sizes only")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline json file")
+    parser.add_argument("--save-baseline", action="store_true", help="overwrite the baseline with this run")
+    parser.add_argument("--check", action="store_true", help="fail if slower than the baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown before --check fails")
+    args = parser.parse_args(argv)
+    if args.check and not args.save_baseline and not os.path.exists(args.baseline):
+        parser.error("no baseline at %s, run --save-baseline first" % args.baseline)
+
+    results = runBenchmarks(args.functions, "quick" if args.quick else "full", args.repeats)
+    print(scalingCurves(results).round(4).to_string(index=False))
+
+    if args.save_baseline:
+        saveBaseline(results, args.baseline)
+        print("\nbaseline saved to %s" % args.baseline)
+
+    if args.check:
+        comparison = compareBaseline(results, args.baseline, args.threshold)
+        print()
+        print(comparison.round(4).to_string(index=False))
+        if comparison["regressed"].any():
+            print("\n%d case(s) slower than baseline by more than %d%%"
+                  % (comparison["regressed"].sum(), args.threshold * 100), file=sys.stderr)
+            return 1
+
+    return 0
+
+#%%
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+#%%
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+
+from . import core
+
+#%% [markdown]
+# # Cash Flow
+# ---
+# **_cashFlow_** lines up the rent roll, the expense recoveries, operating expenses, leasing costs and the
+# loan's amortization table on one month by month index and works out NOI, debt service, DSCR and levered
+# cash flow. Every series is put on the shared calendar by period, so each line is one bincount instead
+# of a join per table.
+#
+# **_equityWaterfall_** splits the levered cash flow between the limited partner (LP) and the sponsor
+# (GP) through preferred return and promote tiers:
+# * **hurdles**: LP IRR that ends each tier, e.g. (0.08, 0.12)
+# * **splits**: LP share of the cash in each tier, one more than the hurdles since the last tier takes
+#   whatever is left, e.g. (0.9, 0.8, 0.7)
+# * **lp_share**: LP share of the equity contributions
+#
+# A tier runs until the LP's IRR on all its flows so far reaches the hurdle, so cash the LP got from the
+# promote tiers counts toward the hurdles on later capital calls. core.waterfall works every row of a 2D
+# array at once, so a sweep over many scenarios can pass its cash flows straight to it.
+
+#%%
+#values summed into the horizon months by calendar period, values outside the horizon are dropped
+def _onHorizon(dates, values, first, count):
+    position = core.period(np.asarray(dates, dtype="datetime64[D]")) - first
+    keep = (position >= 0) & (position < count)
+    return np.bincount(position[keep], weights=np.asarray(values, dtype=float)[keep], minlength=count)
+
+#%%
+#expenses is the yearly operating expense total (or an expense table from newExpense) in expenses_year
+#dollars, grown by expense_growth every year, or a poolRecoveries result to use its pool expenses.
+#start and end default to the rent roll's first and last month
+def cashFlow(rent_roll, expenses, amortization=None, leasing_costs=None, expense_growth=0.03, expenses_year=2019,
+             start=None, end=None):
+    full = rent_roll.full
+    if isinstance(expenses, pd.DataFrame):
+        expenses = expenses["Yearly Expense"].sum()
+
+    first = core.period(pd.Timestamp(start) if start is not None else full.index.min())
+    last = core.period(pd.Timestamp(end) if end is not None else full.index.max())
+    count = last - first + 1
+    periods = np.arange(first, last + 1)
+
+    #the monthly rent roll already has any overrides added in, recoveries come from calculateExpenses
+    rent = _onHorizon(rent_roll.monthly.index.values, rent_roll.monthly["monthsRent"].values, first, count)
+    recoveries = np.zeros(count)
+    if "expenseAmount" in full:
+        recoveries = _onHorizon(full.index.values, full["expenseAmount"].values, first, count)
+    if hasattr(expenses, "monthly"):
+        operating = expenses.monthly["expense"].groupby(level="month").sum()
+        operating = _onHorizon(operating.index.values, operating.values, first, count)
+    else:
+        operating = core.future_value(expense_growth, core.CALENDAR.year[periods] - expenses_year, expenses) / 12
+
+    capital = np.zeros(count)
+    if leasing_costs is not None:
+        capital = _onHorizon(leasing_costs.monthly.index.values, leasing_costs.monthly["leasingCosts"].values, first, count)
+
+    loan = {column: np.zeros(count) for column in ["Interest", "Principal", "Payment", "Additional_Payment"]}
+    if amortization is not None:
+        schedule = amortization.schedule
+        loan = {column: _onHorizon(schedule["Month"].values, schedule[column].values, first, count) for column in loan}
+
+    flows = pd.DataFrame({"rent": rent,
+                          "recoveries": recoveries,
+                          "revenue": rent + recoveries,
+                          "operatingExpenses": operating},
+                         index=pd.DatetimeIndex(core.CALENDAR.monthEnd[periods], name="month"))
+    flows["noi"] = flows["revenue"] - flows["operatingExpenses"]
+    flows["capitalCosts"] = capital
+    flows["cashFlowBeforeDebt"] = flows["noi"] - flows["capitalCosts"]
+    flows["interest"] = loan["Interest"]
+    flows["principal"] = loan["Principal"]
+    flows["additionalPrincipal"] = loan["Additional_Payment"]
+    flows["debtService"] = loan["Payment"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        flows["dscr"] = np.where(flows["debtService"] > 0, flows["noi"] / flows["debtService"], np.nan)
+    flows["leveredCashFlow"] = flows["cashFlowBeforeDebt"] - flows["debtService"] - flows["additionalPrincipal"]
+
+    return flows.round(2)
+
+#%%
+#cash_flow is a cashFlow table (its leveredCashFlow is used) or a Series of monthly cash flows,
+#equity is contributed in the first month on top of any negative months
+def equityWaterfall(cash_flow, equity=0, hurdles=(0.08, 0.12), splits=(0.9, 0.8, 0.7), lp_share=0.9):
+    if isinstance(cash_flow, pd.DataFrame):
+        cash_flow = cash_flow["leveredCashFlow"]
+    flows = cash_flow.values.astype(float).copy()
+    flows[0] -= equity
+
+    split = core.waterfall(flows, hurdles, splits, lp_share)
+    contributions = np.maximum(-flows, 0)
+
+    monthly = pd.DataFrame({"contributions": contributions,
+                            "distributions": np.maximum(flows, 0)},
+                           index=cash_flow.index)
+    for tier, cash in enumerate(split.tiers):
+        monthly["tier%d" % (tier + 1)] = cash
+    monthly["lpContributions"] = contributions * lp_share
+    monthly["lpDistributions"] = split.lp
+    monthly["gpContributions"] = contributions * (1 - lp_share)
+    monthly["gpDistributions"] = split.gp
+
+    partners = {}
+    for partner in ["lp", "gp"]:
+        invested = monthly[partner + "Contributions"]
+        returned = monthly[partner + "Distributions"]
+        partners[partner.upper()] = pd.Series([invested.sum(),
+                                               returned.sum(),
+                                               returned.sum() - invested.sum(),
+                                               returned.sum() / invested.sum() if invested.sum() > 0 else np.nan,
+                                               core.irr((returned - invested).values)],
+                                              index=["Contributions", "Distributions", "Profit", "Equity Multiple", "IRR"])
+    summary = pd.DataFrame(partners)
+
+    #creates a named tuple so the monthly split and the partner returns can be accessed easily
+
+    EquityWaterfall = namedtuple("EquityWaterfall", ["monthly", "summary"])
+    equityWaterfall = EquityWaterfall(monthly.round(2), summary.round(4))
+
+    return equityWaterfall
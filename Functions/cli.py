@@ -0,0 +1,128 @@
+#%%
+import argparse
+import os
+import sys
+import time
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from . import profiling
+from .proforma import STAGES, findProperties, loadProperty, runProforma, writeProforma
+
+#%% [markdown]
+# # Batch Proforma CLI
+# ---
+# Runs every property in a directory of property folders (or a manifest csv) through a proforma
+# and writes one spreadsheet per property plus a portfolio summary.
+#
+#     python -m Functions.cli existing  path/to/properties -o out/ -j 8
+#     python -m Functions.cli construction  path/to/manifest.csv -o out/ --format csv
+#
+# Each property runs in its own worker process, stage timings are reported at the end.
+# With PROFORMA_PROFILE=1 the per-call profile of every worker is also written to profile_trace.json
+# (Chrome trace) and profile_summary.csv in the output directory.
+
+#%%
+#runs in the worker process so only the small summary and timings have to be sent back
+def _runProperty(settings, base_dir, deal_type, out_dir, output_format):
+    timings = {}
+    started = time.perf_counter()
+    try:
+        with profiling.stage("load"):
+            inputs = loadProperty(settings, base_dir, deal_type)
+        timings["load"] = time.perf_counter() - started
+
+        proforma = runProforma(inputs, timings)
+
+        started = time.perf_counter()
+        with profiling.stage("write"):
+            writeProforma(proforma, out_dir, output_format)
+        timings["write"] = time.perf_counter() - started
+
+        summary = proforma.summary.to_dict()
+        summary["Rent Roll Rows"] = len(proforma.rentRoll.full)
+        summary["Error"] = None
+    except Exception as error:
+        summary = {"Property": str(settings.get("name")), "Deal Type": deal_type,
+                   "Error": "%s: %s" % (type(error).__name__, error)}
+
+    #profile events recorded in this worker are sent back with the results
+    events = profiling.events()
+    profiling.reset()
+
+    return summary, timings, events
+
+#%%
+def runBatch(path, out_dir, deal_type="existing", jobs=None, output_format="xlsx"):
+    properties = findProperties(path)
+    os.makedirs(out_dir, exist_ok=True)
+
+    started = time.perf_counter()
+    results = []
+    if jobs == 1:
+        for settings, base_dir in properties:
+            results.append(_runProperty(settings, base_dir, deal_type, out_dir, output_format))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(_runProperty, settings, base_dir, deal_type, out_dir, output_format)
+                       for settings, base_dir in properties]
+            for future in as_completed(futures):
+                results.append(future.result())
+    elapsed = time.perf_counter() - started
+
+    if profiling.ENABLED:
+        events = [event for result in results for event in result[2]]
+        profiling.dumpChromeTrace(os.path.join(out_dir, "profile_trace.json"), events)
+        profiling.summary(events).to_csv(os.path.join(out_dir, "profile_summary.csv"))
+
+    summary = pd.DataFrame([result[0] for result in results])
+    if not summary.empty:
+        summary = summary.sort_values("Property").reset_index(drop=True)
+
+    #seconds spent in each stage summed over every property, stages run in parallel so they add up to more than the wall time
+    timings = pd.DataFrame([result[1] for result in results], columns=STAGES).fillna(0)
+    stageTimings = pd.DataFrame({"Total (s)": timings.sum(),
+                                 "Mean (s)": timings.mean(),
+                                 "Max (s)": timings.max()})
+    stageTimings["Share"] = stageTimings["Total (s)"] / stageTimings["Total (s)"].sum()
+
+    summary.to_csv(os.path.join(out_dir, "portfolio_summary.csv"), index=False)
+    stageTimings.to_csv(os.path.join(out_dir, "stage_timings.csv"))
+
+    rows = summary["Rent Roll Rows"].sum() if "Rent Roll Rows" in summary else 0
+    throughput = pd.Series([len(properties), elapsed,
+                            len(properties) / elapsed if elapsed else 0,
+                            rows / elapsed if elapsed else 0],
+                           index=["Properties", "Wall Time (s)", "Properties / s", "Rent Roll Rows / s"])
+
+    return summary, stageTimings, throughput
+
+#%%
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="proforma", description="Run proformas for a folder or manifest of properties.")
+    parser.add_argument("deal_type", choices=["existing", "construction"],
+                        help="existing buildings or construction projects (construction deals require construction.csv)")
+    parser.add_argument("path", help="directory of property folders or a manifest csv")
+    parser.add_argument("-o", "--out", default="proforma_output", help="output directory")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: one per cpu)")
+    parser.add_argument("--format", dest="output_format", choices=["xlsx", "csv"], default="xlsx",
+                        help="per-property output format")
+    args = parser.parse_args(argv)
+
+    summary, stageTimings, throughput = runBatch(args.path, args.out, args.deal_type, args.jobs, args.output_format)
+
+    print(summary.drop(columns=["Error"], errors="ignore").to_string(index=False))
+    print()
+    print(stageTimings.round(4).to_string())
+    print()
+    print(throughput.round(2).to_string())
+
+    failed = summary[summary["Error"].notnull()] if "Error" in summary else summary.iloc[0:0]
+    for _, row in failed.iterrows():
+        print("failed: %s (%s)" % (row["Property"], row["Error"]), file=sys.stderr)
+
+    return 1 if len(failed) else 0
+
+#%%
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+#%%
+import numpy as np
+from collections import namedtuple
+
+#%% [markdown]
+# # Core
+# ---
+# Loan and lease math on plain NumPy arrays. Nothing in here imports pandas, so short lived workers
+# can price a loan or a lease without paying the pandas import, and the DataFrame builders in
+# leases.py and finance.py use the same functions underneath.
+#
+# Dates can be anything np.datetime64 understands (date, datetime, Timestamp or an ISO string).
+# Months are numpy 'datetime64[M]' values. Every month between CALENDAR_START and CALENDAR_END has a
+# row in **_CALENDAR_** and a period number (its row), so schedules built here share the same keys.
+
+#average days in a month, the same length numpy uses for np.timedelta64(1, 'M')
+DAYS_PER_MONTH = 365.2425 / 12
+
+#%%
+#payment per period for a fully amortizing loan, same as -np.pmt(rate, periods, principal)
+def payment(rate, periods, principal):
+    rate = np.asarray(rate, dtype=float)
+    periods = np.asarray(periods, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        factor = (1 + rate) ** periods
+        level = np.where(rate == 0, principal / periods, principal * rate * factor / (factor - 1))
+    return level[()]
+
+#%%
+#future value of present_value after periods of growth at rate, same as np.fv(rate, periods, 0, -present_value)
+def future_value(rate, periods, present_value):
+    return present_value * (1 + np.asarray(rate, dtype=float)) ** np.asarray(periods, dtype=float)
+
+#%%
+#runs the amortize loop into plain arrays, one entry per period
+def amortize(principal, interest_rate, pmt, addl_principal=0, annual_payments=12):
+    period_rate = interest_rate / annual_payments
+    beg_balance = principal
+    end_balance = principal
+
+    begin, payments, principals, interests, additional, end = [], [], [], [], [], []
+
+    while end_balance > 0:
+        # Recalculate the interest based on the current balance
+        interest = round(period_rate * beg_balance, 2)
+
+        # Determine payment based on whether or not this period will pay off the loan
+        pmt = min(pmt, beg_balance + interest)
+        principal_paid = pmt - interest
+
+        # Ensure additional payment gets adjusted if the loan is being paid off
+        addl_principal = min(addl_principal, beg_balance - principal_paid)
+        end_balance = beg_balance - (principal_paid + addl_principal)
+
+        begin.append(beg_balance)
+        payments.append(pmt)
+        principals.append(principal_paid)
+        interests.append(interest)
+        additional.append(addl_principal)
+        end.append(end_balance)
+
+        beg_balance = end_balance
+
+    Amortization = namedtuple("Amortization", ["period", "begin", "payment", "interest", "principal",
+                                               "additional", "end"])
+    amortization = Amortization(np.arange(1, len(begin) + 1), np.array(begin), np.array(payments),
+                                np.array(interests), np.array(principals), np.array(additional), np.array(end))
+
+    return amortization
+
+#%%
+#internal rate of return of each row of cash_flows (one column per period), annualized from
+#periods_per_year periods. Found by bisection on every row at once, rows without a sign change are nan
+def irr(cash_flows, periods_per_year=12, iterations=100):
+    flows = np.asarray(cash_flows, dtype=float)
+    periods = np.arange(flows.shape[-1])
+
+    def npv(rate):
+        return (flows * (1 + rate[..., None]) ** -periods).sum(axis=-1)
+
+    #-50% to +100% a period brackets any return a property can realistically make
+    low = np.full(flows.shape[:-1], -0.5)
+    high = np.full(flows.shape[:-1], 1.0)
+    low_value = npv(low)
+    valid = np.sign(low_value) != np.sign(npv(high))
+
+    for _ in range(iterations):
+        middle = (low + high) / 2
+        middle_value = npv(middle)
+        same = np.sign(middle_value) == np.sign(low_value)
+        low = np.where(same, middle, low)
+        low_value = np.where(same, middle_value, low_value)
+        high = np.where(same, high, middle)
+
+    rate = np.where(valid, (1 + (low + high) / 2) ** periods_per_year - 1, np.nan)
+    return rate[()]
+
+#%%
+#splits the cash flows (one column per period, negative entries are capital calls) between the
+#limited partner and the sponsor. Every tier but the last runs until the LP reaches its hurdle
+#(annual IRR on all the LP's flows so far), the last tier takes the rest. splits is the LP share of
+#the cash in each tier, lp_share the LP share of the contributions.
+#What the LP is still owed to reach each hurdle is carried from period to period (grown at the
+#hurdle, less every LP distribution from any tier), so the loop is over periods and every row of
+#cash_flows is worked at once
+def waterfall(cash_flows, hurdles, splits, lp_share, periods_per_year=12):
+    flows = np.asarray(cash_flows, dtype=float)
+    if len(splits) != len(hurdles) + 1:
+        raise ValueError("need one more split than hurdles (the last tier has no hurdle)")
+
+    rows = flows.shape[:-1]
+    growth = ((1 + np.asarray(hurdles, dtype=float)) ** (1 / periods_per_year)).reshape((-1,) + (1,) * len(rows))
+    lp_contributions = np.maximum(-flows, 0) * lp_share
+    distributions = np.maximum(flows, 0)
+
+    #owed is negative once the LP is past a hurdle, so cash paid above it counts toward later calls
+    owed = np.zeros((len(hurdles),) + rows)
+    tiers = np.zeros((len(splits),) + flows.shape)
+    for period in range(flows.shape[-1]):
+        owed = owed * growth + lp_contributions[..., period]
+        remaining = distributions[..., period]
+        paid = np.zeros(rows)
+        for tier, split in enumerate(splits[:-1]):
+            cash = np.minimum(remaining, np.maximum(owed[tier] - paid, 0) / split)
+            tiers[tier, ..., period] = cash
+            paid = paid + cash * split
+            remaining = remaining - cash
+        tiers[-1, ..., period] = remaining
+        owed = owed - (paid + remaining * splits[-1])
+
+    lp = np.tensordot(np.asarray(splits, dtype=float), tiers, axes=1)
+    gp = tiers.sum(axis=0) - lp
+
+    Waterfall = namedtuple("Waterfall", ["lp", "gp", "tiers"])
+    waterfall = Waterfall(lp, gp, tiers)
+
+    return waterfall
+
+#%%
+#shared calendar, one row per month of the model horizon. Lease, loan and rollup code look dates up in
+#here by period (months since CALENDAR_START) instead of building and converting dates on every call,
+#and the period numbers double as join keys between schedules
+CALENDAR_START = np.datetime64("1900-01", "M")
+CALENDAR_END = np.datetime64("2199-12", "M")
+
+def _calendar(first, last):
+    months = np.arange(first, last + 1, dtype="datetime64[M]")
+    month_start = months.astype("datetime64[D]")
+    month_end = (months + 1).astype("datetime64[D]") - 1
+    month_of_year = months.astype(int) % 12 + 1
+
+    Calendar = namedtuple("Calendar", ["month", "monthStart", "monthEnd", "days", "year", "quarter", "monthOfYear"])
+    calendar = Calendar(months, month_start, month_end, (month_end - month_start).astype(int) + 1,
+                        months.astype("datetime64[Y]").astype(int) + 1970, (month_of_year - 1) // 3 + 1, month_of_year)
+
+    return calendar
+
+CALENDAR = _calendar(CALENDAR_START, CALENDAR_END)
+
+#%%
+def to_day(value):
+    return np.datetime64(value, "D")
+
+def to_month(value):
+    return np.datetime64(value, "M")
+
+#calendar row of each date (or month)
+def period(dates):
+    position = (np.asarray(dates, dtype="datetime64[M]") - CALENDAR_START).astype(int)
+    if position.size and (position.min() < 0 or position.max() >= len(CALENDAR.month)):
+        raise ValueError("dates must fall between %s and %s" % (CALENDAR_START, CALENDAR_END))
+    return position[()]
+
+#fiscal year (labeled by the calendar year it ends in) and month of the fiscal year for each period
+def fiscal_period(periods, fiscal_start_month=1):
+    periods = np.asarray(periods)
+    shifted = CALENDAR.monthOfYear[periods] - fiscal_start_month
+    fiscal_year = CALENDAR.year[periods] + (shifted >= 0) * (fiscal_start_month > 1)
+    return fiscal_year, shifted % 12 + 1
+
+#last day of each month as datetime64[D]
+def month_end(months):
+    return CALENDAR.monthEnd[period(months)]
+
+def days_in_month(months):
+    return CALENDAR.days[period(months)]
+
+#start_date moved forward by each number of months, the day is clipped to the end of shorter months
+def add_months(start_date, months):
+    start = to_day(start_date)
+    first = period(start)
+    shifted = first + np.asarray(months)
+    if np.max(shifted, initial=first) >= len(CALENDAR.month):
+        raise ValueError("dates must fall between %s and %s" % (CALENDAR_START, CALENDAR_END))
+    day = (start - CALENDAR.monthStart[first]).astype(int)
+    return CALENDAR.monthStart[shifted] + np.minimum(day, CALENDAR.days[shifted] - 1)
+
+#whole months between two dates, rounded like (end - start) / np.timedelta64(1, 'M')
+def months_between(start_date, end_date):
+    days = (to_day(end_date) - to_day(start_date)).astype(int)
+    return int(np.around(days / DAYS_PER_MONTH))
+
+#%%
+#one row per lease month in input order: the position of the lease each row belongs to, the month
+#number within the lease (0 for the first month) and the calendar period. With from_date only the
+#months from then on get rows (month numbers still count from the lease start)
+def lease_periods(start_dates, end_dates, from_date=None):
+    first = period(np.asarray(start_dates, dtype="datetime64[M]"))
+    skipped = np.zeros_like(first)
+    if from_date is not None:
+        skipped = np.maximum(period(to_month(from_date)) - first, 0)
+    counts = np.maximum(period(np.asarray(end_dates, dtype="datetime64[M]")) - first + 1 - skipped, 0)
+    lease = np.repeat(np.arange(len(first)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + skipped[lease]
+    return lease, offsets, first[lease] + offsets
+
+#%%
+#month by month rent for a batch of leases in one pass, rows are grouped by lease in input order.
+#percent_increase raises the rate every January 1 after the start year like newLeaseSchedule does,
+#rates replaces that with an annual rate PSF for every row (in lease_periods order), from_date leaves out
+#the months before it. Partial first and last months are prorated by the days occupied
+def lease_rents(start_dates, end_dates, rental_rate_psf, occupied_sf, percent_increase=0, rates=None, from_date=None):
+    start = np.asarray(start_dates, dtype="datetime64[D]")
+    end = np.asarray(end_dates, dtype="datetime64[D]")
+    first_month = start.astype("datetime64[M]")
+    last_month = end.astype("datetime64[M]")
+
+    #one row per lease month, lease holds the position of the lease each row belongs to
+    lease, offsets, periods = lease_periods(start, end, from_date)
+    first_period = period(first_month)
+
+    #month dates come from the shared calendar by period instead of converting every row
+    months = CALENDAR.month[periods]
+    month_start = CALENDAR.monthStart[periods]
+    last_day = CALENDAR.monthEnd[periods]
+    month_days = CALENDAR.days[periods]
+
+    lease_start = start[lease]
+    lease_end = end[lease]
+
+    is_first = offsets == 0
+    is_last = months == last_month[lease]
+    first_days = np.where(is_first, (last_day - lease_start).astype(int) + 1, 0)
+    last_days = np.where(is_last, (lease_end - month_start).astype(int) + 1, 0)
+    partial_days = first_days + last_days
+
+    if rates is None:
+        years = CALENDAR.year[periods] - CALENDAR.year[first_period][lease]
+        increase = np.broadcast_to(np.asarray(percent_increase, dtype=float), start.shape)[lease]
+        rate = np.broadcast_to(np.asarray(rental_rate_psf, dtype=float), start.shape)[lease] * (1 + increase) ** years
+    else:
+        rate = np.asarray(rates, dtype=float)
+    sf = np.broadcast_to(np.asarray(occupied_sf, dtype=float), start.shape)[lease]
+
+    #need to round all partial cents up
+    #(rounded to 6 places first so a whole number of cents isn't pushed up by float error)
+    full_month_rent = np.ceil(np.round(sf * rate / 12 * 100, 6)) / 100
+
+    #a lease that starts and ends in the same month only pays for the days between the two dates
+    occupied_days = np.minimum(last_day, lease_end) - np.maximum(month_start, lease_start)
+    occupied_days = occupied_days.astype(int) + 1
+    collected_rent = np.where(partial_days > 0, np.round(full_month_rent / month_days * occupied_days, 2), full_month_rent)
+
+    LeaseRent = namedtuple("LeaseRent", ["lease", "months", "period", "monthEnd", "isFirstMonth", "isLastMonth", "firstMoDays",
+                                         "lastMoDays", "partialDays", "rentalRate", "fullMonthRent", "collectedRent"])
+    leaseRent = LeaseRent(lease, months, periods, last_day, is_first, is_last, first_days, last_days, partial_days,
+                          rate, full_month_rent, collected_rent)
+
+    return leaseRent
+
+#%%
+#month by month rent for one lease
+def lease_rent(start_date, end_date, rental_rate_psf, occupied_sf, percent_increase=0):
+    return lease_rents([to_day(start_date)], [to_day(end_date)], rental_rate_psf, occupied_sf, percent_increase)
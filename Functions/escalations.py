@@ -0,0 +1,142 @@
+#%%
+import numpy as np
+import pandas as pd
+
+try:
+    from . import core
+except ImportError:
+    import core
+
+#%% [markdown]
+# # Rent Escalations
+# ---
+# **_escalatedRates_** works out the rental rate of every lease month for a whole lease table at once,
+# for leases that escalate by a fixed percent, by an index (CPI) or reset to a market rent curve.
+# **_newLeaseBatch_** uses it when the lease table has an escalationType column or resets are given.
+#
+# Lease table columns (all optional):
+# * **escalationType**: "fixed" (percentIncrease every 1/1 after the start year, the default) or "index"
+# * **escalationFloor** / **escalationCap**: least / most an index escalation can raise the rate (0.01 = 1%)
+# * **lagMonths**: the index (and market curve) are read this many months before the adjustment
+# * **adjustMonth**: month of the year index escalations happen (default: the lease anniversary)
+#
+# Index escalations raise the rate by the index's change over the 12 months before each adjustment.
+# Months without an index value keep the rate where it is, so a forecast can be appended to the index.
+#
+# Market resets are a table of tenantName, suite and resetDate: the rate resets to the market curve
+# (rent PSF by date) on that date and escalates from there. A rentalRate column in the resets sets the
+# new rate directly instead (no market curve needed). With upward_only a reset never lowers the rate.
+
+ESCALATION_TYPES = ["fixed", "index"]
+
+#%%
+#value of a dated series in every calendar period (latest value on or before it), nan before it starts
+def _levels(series):
+    curve = pd.Series(series)
+    curve = pd.Series(curve.values, index=core.period(pd.to_datetime(curve.index).values))
+    curve = curve.sort_index().groupby(level=0).last()
+
+    latest = np.searchsorted(curve.index.values, np.arange(len(core.CALENDAR.month)), side="right") - 1
+    return np.where(latest >= 0, curve.values[np.clip(latest, 0, None)], np.nan)
+
+def _column(leases, column, default):
+    if column in leases:
+        return leases[column].fillna(default).values
+    return np.full(len(leases), default)
+
+#%%
+#events are (lease, period) entries sorted by lease then period, each one an escalation (log growth)
+#or a reset (log market rate)
+def _escalations(leases, first, last, index):
+    kind = pd.Series(_column(leases, "escalationType", "fixed"), dtype=str).str.strip().str.lower().values
+    unknown = sorted(set(kind) - set(ESCALATION_TYPES))
+    if unknown:
+        raise ValueError("escalationType must be one of %s, not %s" % (", ".join(ESCALATION_TYPES), ", ".join(unknown)))
+    is_index = kind == "index"
+    if is_index.any() and index is None:
+        raise ValueError("%d lease(s) escalate by index but no index was given" % is_index.sum())
+
+    #fixed leases step up every January, index leases on their adjust month or anniversary
+    month_of_year = core.CALENDAR.monthOfYear[first]
+    adjust_month = np.where(is_index, _column(leases, "adjustMonth", np.nan), 1)
+    adjust_month = np.where(np.isnan(adjust_month), month_of_year, adjust_month).astype(int)
+    next_adjustment = first + (adjust_month - month_of_year - 1) % 12 + 1
+
+    counts = np.maximum((last - next_adjustment) // 12 + 1, 0)
+    lease = np.repeat(np.arange(len(leases)), counts)
+    periods = next_adjustment[lease] + 12 * (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts))
+
+    growth = _column(leases, "percentIncrease", 0.0)[lease].astype(float)
+    indexed = is_index[lease]
+    if indexed.any():
+        levels = _levels(index)
+        lag = _column(leases, "lagMonths", 0).astype(int)[lease]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            change = levels[periods - lag] / levels[periods - 12 - lag] - 1
+        change = np.clip(change, _column(leases, "escalationFloor", -np.inf)[lease],
+                         _column(leases, "escalationCap", np.inf)[lease])
+        growth = np.where(indexed, np.nan_to_num(change, nan=0.0), growth)
+
+    return lease, periods, np.log1p(growth)
+
+def _resets(leases, first, last, market, resets):
+    terms = pd.DataFrame({"tenantName": leases["tenantName"].values, "suite": leases["suite"].values,
+                          "lease": np.arange(len(leases))})
+    columns = [column for column in ["tenantName", "suite", "resetDate", "rentalRate"] if column in resets]
+    matched = terms.merge(resets[columns], on=["tenantName", "suite"])
+    periods = core.period(pd.to_datetime(matched["resetDate"]).values)
+    lease = matched["lease"].values
+
+    #resets without a rentalRate read the market curve
+    rates = np.array(matched["rentalRate"], dtype=float) if "rentalRate" in matched else np.full(len(matched), np.nan)
+    to_market = np.isnan(rates)
+    if to_market.any():
+        if market is None:
+            raise ValueError("market resets need a market rent curve")
+        rates[to_market] = _levels(market)[(periods - _column(leases, "lagMonths", 0).astype(int)[lease])[to_market]]
+
+    #resets outside the lease term and months before the market curve starts are skipped
+    keep = (periods > first[lease]) & (periods <= last[lease]) & ~np.isnan(rates)
+    with np.errstate(divide="ignore"):
+        return lease[keep], periods[keep], np.log(rates[keep])
+
+#%%
+#rental rate PSF of every lease month in core.lease_periods order, index and market are Series by date
+def escalatedRates(leases, index=None, market=None, resets=None, upward_only=False, from_date=None):
+    start = pd.to_datetime(leases["startDate"]).values
+    end = pd.to_datetime(leases["endDate"]).values
+    row_lease, offsets, row_periods = core.lease_periods(start, end, from_date)
+    first, last = core.period(start), core.period(end)
+    with np.errstate(divide="ignore"):
+        base = np.log(leases["rentalRate"].values.astype(float))
+
+    lease, periods, growth = _escalations(leases, first, last, index)
+    reset_rate = np.full(len(lease), np.nan)
+    if resets is not None and len(resets):
+        reset_lease, reset_periods, reset_log = _resets(leases, first, last, market, resets)
+        lease = np.concatenate([lease, reset_lease])
+        periods = np.concatenate([periods, reset_periods])
+        growth = np.concatenate([growth, np.zeros(len(reset_lease))])
+        reset_rate = np.concatenate([reset_rate, reset_log])
+
+    #a reset in the same month as an escalation comes after it
+    order = np.lexsort((~np.isnan(reset_rate), periods, lease))
+    lease, periods, growth, reset_rate = lease[order], periods[order], growth[order], reset_rate[order]
+
+    #running growth within each lease, the rate level is carried from the base rate or the latest reset
+    #(the highest so far with upward_only) so each event's rate is level + growth in log terms
+    grown = pd.Series(growth).groupby(lease).cumsum().values
+    level = pd.Series(reset_rate - grown)
+    if upward_only:
+        level = level.fillna(-np.inf).groupby(lease).cummax().values
+        level = np.maximum(level, base[lease])
+    else:
+        level = level.groupby(lease).ffill().values
+        level = np.where(np.isnan(level), base[lease], level)
+    event_rate = np.exp(level + grown)
+
+    #every lease month takes the rate of its lease's latest event, months before the first one the base rate
+    calendar_months = len(core.CALENDAR.month)
+    latest = np.searchsorted(lease * calendar_months + periods, row_lease * calendar_months + row_periods, side="right") - 1
+    found = (latest >= 0) & (lease[np.clip(latest, 0, None)] == row_lease)
+    return np.where(found, event_rate[np.clip(latest, 0, None)], np.exp(base[row_lease]))
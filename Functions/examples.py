@@ -20,8 +20,9 @@ from dateutil.relativedelta import *
 from dateutil.rrule import rrule, MONTHLY
 from pandas.tseries.offsets import MonthEnd
 
-from leases import * 
-from finance import *
+from leases import newLease, newLeaseSchedule, newRentRoll, newExpense, calculateExpenses
+from finance import amortization_table
+from analytics import occupancyStats
 
 #%% [markdown]
 # # Income Functions
@@ -210,12 +211,13 @@ leaseSchedule = newLeaseSchedule(
  percent_increase = 0.02)
 
 
-###need to turn this into a function, so the occ_sf can be done on the entire table.
 prosperityRentRollFull = newRentRoll([leaseSchedule.schedule, prosperityOriginal.schedule,prosperity1.schedule])
 prosperityRentRoll = prosperityRentRollFull.yearly
 
+#occupancyStats works on the entire table, psf uses each year's average leased SF so it lines up with yearsRent
+prosperityStats = occupancyStats(prosperityRentRollFull, 6753.00)
 prosperityRentRoll['monthly'] = round(prosperityRentRoll.yearsRent / 12,2)
-prosperityRentRoll['psf'] = round(prosperityRentRoll.yearsRent / prosperityRentRollFull.full.occupiedSF,2)
+prosperityRentRoll['psf'] = round(prosperityRentRoll.yearsRent / prosperityStats.leasedSF.groupby(prosperityStats.index.year).mean(),2)
 
 
 prosperityRentRoll
@@ -3,62 +3,52 @@ import pandas as pd
 from datetime import date
 import numpy as np
 from collections import OrderedDict, namedtuple
-from dateutil.relativedelta import *
-from dateutil.rrule import rrule, MONTHLY
-from pandas.tseries.offsets import MonthEnd
+
+try:
+    from . import core
+    from .profiling import instrument
+except ImportError:
+    import core
+    from profiling import instrument
 
 
 #%%
+@instrument
 def amortize(principal, interest_rate, years, pmt, addl_principal, start_date, annual_payments):
 
-    # initialize the variables to keep track of the periods and running balances
-    p = 1
-    beg_balance = principal
-    end_balance = principal
-    
-    while end_balance > 0:
-        
-        # Recalculate the interest based on the current balance
-        interest = round(((interest_rate/annual_payments) * beg_balance), 2)
-        
-        # Determine payment based on whether or not this period will pay off the loan
-        pmt = min(pmt, beg_balance + interest)
-        principal = pmt - interest
-        
-        # Ensure additional payment gets adjusted if the loan is being paid off
-        addl_principal = min(addl_principal, beg_balance - principal)
-        end_balance = beg_balance - (principal + addl_principal)
+    # the schedule comes from the numpy core, each period is handed out as a row
+    loan = core.amortize(principal, interest_rate, pmt, addl_principal, annual_payments)
+    months = core.add_months(start_date, loan.period - 1).astype(date)
 
-        yield OrderedDict([('Month',start_date),
-                           ('Period', p),
-                           ('Begin Balance', beg_balance),
-                           ('Payment', pmt),
-                           ('Principal', principal),
-                           ('Interest', interest),
-                           ('Additional_Payment', addl_principal),
-                           ('End Balance', end_balance)])
-        
-        # Increment the counter, balance and date
-        p += 1
-        start_date += relativedelta(months=1)
-        beg_balance = end_balance
+    for i, p in enumerate(loan.period):
+        yield OrderedDict([('Month', months[i]),
+                           ('Period', int(p)),
+                           ('Begin Balance', loan.begin[i]),
+                           ('Payment', loan.payment[i]),
+                           ('Principal', loan.principal[i]),
+                           ('Interest', loan.interest[i]),
+                           ('Additional_Payment', loan.additional[i]),
+                           ('End Balance', loan.end[i])])
 
 
 #%%
+@instrument
 def amortization_table(principal, interest_rate, years,
                        addl_principal=0, annual_payments=12, start_date=date.today()):
 
     # Payment stays constant based on the original terms of the loan
-    payment = -round(np.pmt(interest_rate/annual_payments, years*annual_payments, principal), 2)
-    
-    # Generate the schedule and order the resulting columns for convenience
-    schedule = pd.DataFrame(amortize(principal, interest_rate, years, payment,
-                                     addl_principal, start_date, annual_payments))
-    schedule = schedule[["Period", "Month", "Begin Balance", "Payment", "Interest", 
-                         "Principal", "Additional_Payment", "End Balance"]]
+    payment = round(float(core.payment(interest_rate/annual_payments, years*annual_payments, principal)), 2)
     
-    # Convert to a datetime object to make subsequent calcs easier
-    schedule["Month"] = pd.to_datetime(schedule["Month"])
+    # Generate the schedule with the numpy core (amortize without building a dict per period)
+    loan = core.amortize(principal, interest_rate, payment, addl_principal, annual_payments)
+    schedule = pd.DataFrame({"Period": loan.period,
+                             "Month": pd.to_datetime(core.add_months(start_date, loan.period - 1)),
+                             "Begin Balance": loan.begin,
+                             "Payment": loan.payment,
+                             "Interest": loan.interest,
+                             "Principal": loan.principal,
+                             "Additional_Payment": loan.additional,
+                             "End Balance": loan.end})
     
     #Create a summary statistics table
     payoff_date = schedule["Month"].iloc[-1]
@@ -74,3 +64,31 @@ def amortization_table(principal, interest_rate, years,
     amortizationTable = AmortizationTable(schedule, stats)                              
                                       
     return amortizationTable
+
+
+#%%
+#the rest of a loan from a known balance (e.g. the last actual End Balance) at the loan's original payment,
+#start_date is the month after that balance and first_period its payment number
+@instrument
+def remaining_amortization_table(balance, interest_rate, payment, addl_principal=0, annual_payments=12,
+                                 start_date=date.today(), first_period=1):
+
+    loan = core.amortize(balance, interest_rate, payment, addl_principal, annual_payments)
+    schedule = pd.DataFrame({"Period": loan.period + first_period - 1,
+                             "Month": pd.to_datetime(core.add_months(start_date, loan.period - 1)),
+                             "Begin Balance": loan.begin,
+                             "Payment": loan.payment,
+                             "Interest": loan.interest,
+                             "Principal": loan.principal,
+                             "Additional_Payment": loan.additional,
+                             "End Balance": loan.end})
+
+    stats = pd.Series([schedule["Month"].iloc[-1] if len(schedule) else pd.NaT, schedule["Period"].count(),
+                       interest_rate, balance, payment, addl_principal, schedule["Interest"].sum()],
+                      index=["Payoff Date", "Num Payments", "Interest Rate", "Balance", "Payment",
+                             "Additional Payment", "Total Interest"])
+
+    AmortizationTable = namedtuple("AmortizationTable", ["schedule", "stats"])
+    amortizationTable = AmortizationTable(schedule, stats)
+
+    return amortizationTable
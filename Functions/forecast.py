@@ -0,0 +1,140 @@
+#%%
+import os
+import numpy as np
+import pandas as pd
+from datetime import date
+
+from . import core
+from .leases import newLeaseBatch, newRentRoll, calculateExpenses
+from .finance import amortization_table, remaining_amortization_table
+from .cashflow import cashFlow
+from .proforma import loanOptions
+
+#%% [markdown]
+# # Rolling Forecast
+# ---
+# Booked actuals are kept in a store (a folder with one actuals.csv for every property). Closing a month
+# appends that month's actuals to the file, months already in the store are frozen and can't be booked
+# again. **_rollForecast_** then only works out the months after the last actual:
+# * rent from newLeaseBatch(..., from_date) for the leases still running, so history isn't rescheduled
+# * recoveries and operating expenses for those months
+# * debt service from the last actual End Balance at the loan's original payment
+#
+# Actuals columns: property, month, rent and optionally recoveries, operatingExpenses, interest,
+# principal, additionalPrincipal and endBalance (the loan balance after the month's payment).
+#
+#     closeMonth("store/", [loadProperty(settings, folder) for settings, folder in findProperties("properties/")], actuals)
+
+ACTUAL_COLUMNS = ["property", "month", "rent", "recoveries", "operatingExpenses", "interest", "principal",
+                  "additionalPrincipal", "endBalance"]
+
+#optional actuals that count as 0 when they're missing, a missing endBalance stays unknown
+OPTIONAL_FLOWS = ["recoveries", "operatingExpenses", "interest", "principal", "additionalPrincipal"]
+
+FORECAST_COLUMNS = ["rent", "recoveries", "operatingExpenses", "noi", "interest", "principal", "additionalPrincipal",
+                    "debtService", "endBalance", "leveredCashFlow"]
+
+#%%
+def loadActuals(store):
+    path = os.path.join(store, "actuals.csv")
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=ACTUAL_COLUMNS)
+    actuals = pd.read_csv(path, parse_dates=["month"], dtype={"property": str})
+    return actuals
+
+#appends actuals to the store, every month has to come after the property's last stored month
+def appendActuals(store, actuals):
+    actuals = actuals.reindex(columns=ACTUAL_COLUMNS)
+    actuals["property"] = actuals["property"].astype(str)
+    actuals["month"] = pd.to_datetime(actuals["month"]) + pd.offsets.MonthEnd(0)
+    for column in OPTIONAL_FLOWS:
+        actuals[column] = actuals[column].fillna(0.0)
+
+    closed = loadActuals(store).groupby("property")["month"].max()
+    frozen = actuals["month"] <= actuals["property"].map(closed)
+    if frozen.any():
+        booked = actuals[frozen]
+        raise ValueError("%d actual(s) are for months already closed, e.g. %s %s"
+                         % (frozen.sum(), booked["property"].iloc[0], booked["month"].iloc[0].date()))
+
+    os.makedirs(store, exist_ok=True)
+    path = os.path.join(store, "actuals.csv")
+    actuals.sort_values(["property", "month"]).to_csv(path, mode="a", header=not os.path.exists(path), index=False)
+    return actuals
+
+#%%
+#actual months as booked followed by the forecast from the month after the last actual to end
+#(the last lease month by default), inputs is a proforma.loadProperty result
+def rollForecast(inputs, actuals=None, end=None):
+    if actuals is None or actuals.empty:
+        actuals = pd.DataFrame(columns=ACTUAL_COLUMNS)
+    actuals = actuals.reindex(columns=ACTUAL_COLUMNS).sort_values("month")
+    for column in OPTIONAL_FLOWS:
+        actuals[column] = actuals[column].fillna(0.0)
+    booked = pd.DataFrame({column: actuals[column].astype(float).values for column in ACTUAL_COLUMNS[2:]},
+                          index=pd.DatetimeIndex(actuals["month"].values, name="month"))
+    booked["noi"] = booked["rent"] + booked["recoveries"] - booked["operatingExpenses"]
+    booked["debtService"] = booked["interest"] + booked["principal"]
+    booked["leveredCashFlow"] = booked["noi"] - booked["debtService"] - booked["additionalPrincipal"]
+    booked["source"] = "actual"
+
+    leases = inputs.leases
+    cutoff = None
+    if len(booked):
+        cutoff = core.CALENDAR.monthStart[core.period(booked.index[-1]) + 1]
+        leases = leases[pd.to_datetime(leases["endDate"]).values >= cutoff]
+
+    schedule = newLeaseBatch(leases, resets=inputs.resets, from_date=cutoff)
+    if schedule.empty:
+        return booked[FORECAST_COLUMNS + ["source"]]
+
+    rentRoll = newRentRoll([schedule])
+    expenseAmount = inputs.expenses["Yearly Expense"].sum()
+    calculateExpenses(rentRoll, expenseAmount, inputs.buildingSize,
+                      percent_increase=inputs.expenseGrowth, expenses_year=inputs.expensesYear)
+
+    amortization = None
+    if inputs.loan is not None:
+        loan = inputs.loan
+        options = loanOptions(loan)
+        balances = booked["endBalance"].dropna()
+        if len(balances):
+            annual_payments = options.get("annual_payments", 12)
+            start_date = options.get("start_date", date.today())
+            payment = round(float(core.payment(loan["interest_rate"] / annual_payments,
+                                               int(loan["years"]) * annual_payments, loan["principal"])), 2)
+            paid = core.period(cutoff) - core.period(core.to_day(start_date))
+            amortization = remaining_amortization_table(balances.iloc[-1], loan["interest_rate"], payment,
+                                                        options.get("addl_principal", 0), annual_payments,
+                                                        core.add_months(start_date, paid), paid + 1)
+        else:
+            amortization = amortization_table(loan["principal"], loan["interest_rate"], int(loan["years"]), **options)
+
+    flows = cashFlow(rentRoll, expenseAmount, amortization, expense_growth=inputs.expenseGrowth,
+                     expenses_year=inputs.expensesYear, start=cutoff, end=end)
+
+    #balance after each month's payment, nan before the loan starts and 0 once it's paid off
+    flows["endBalance"] = np.nan
+    if amortization is not None and len(amortization.schedule):
+        schedule = amortization.schedule
+        balance = pd.Series(schedule["End Balance"].values, index=core.period(schedule["Month"].values))
+        periods = core.period(flows.index.values)
+        flows["endBalance"] = balance.groupby(level=0).last().reindex(periods).values
+        flows.loc[periods > balance.index.max(), "endBalance"] = 0.0
+    flows["source"] = "forecast"
+
+    return pd.concat([booked[FORECAST_COLUMNS + ["source"]], flows[FORECAST_COLUMNS + ["source"]]])
+
+#%%
+#books the month's actuals for every property and rolls each property's forecast forward, the combined
+#forecast is written to forecast.csv in the store
+def closeMonth(store, properties, actuals, end=None):
+    appendActuals(store, actuals)
+    stored = loadActuals(store)
+    byProperty = dict(list(stored.groupby("property")))
+
+    forecasts = [rollForecast(inputs, byProperty.get(inputs.name), end) for inputs in properties]
+    forecast = pd.concat(forecasts, keys=[inputs.name for inputs in properties], names=["property", "month"])
+    forecast.to_csv(os.path.join(store, "forecast.csv"))
+
+    return forecast
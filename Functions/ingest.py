@@ -0,0 +1,210 @@
+#%%
+import os
+import re
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+
+from . import core
+from .leases import newLeaseBatch, newRentRoll
+from .escalations import ESCALATION_TYPES
+
+#%% [markdown]
+# # Rent Roll Import
+# ---
+# Reads rent roll exports (csv or Excel, one row per lease) and turns them into lease terms that
+# **_newLeaseBatch_** can schedule in one pass. Column names are matched loosely so exports using the
+# schedule names (tenantName, occupiedSF, ...), the proforma leases.csv names (tenant_name,
+# occupied_sf, ...) or plain headers (Tenant Name, SF, ...) all load the same way.
+#
+# Lease-month schedule exports (newLease / newRentRoll output like Outputs/lease.csv, a month end date
+# in the first column and no start or end dates) are collapsed back into lease terms first: every run
+# of consecutive months of a tenant's suite at the same SF is one lease, the partial first and last
+# months (firstMoDays / lastMoDays) give the start and end days. Each month's rate is read back from its
+# fullMonthRent (the rounded rentalRate if there isn't one) and every rate change within a term is
+# returned in **_readRentRoll(...).resets_** for newLeaseBatch(leases, resets=resets).
+#
+# Rows that can't be scheduled are kept out of the lease table and returned with the reason in
+# **_readRentRoll(...).rejected_**.
+
+#normalized header -> lease term column
+COLUMN_ALIASES = {"tenantname": "tenantName", "tenant": "tenantName", "name": "tenantName",
+                  "suite": "suite", "unit": "suite", "space": "suite",
+                  "occupiedsf": "occupiedSF", "sf": "occupiedSF", "sqft": "occupiedSF", "squarefeet": "occupiedSF",
+                  "rentalrate": "rentalRate", "rentalratepsf": "rentalRate", "rate": "rentalRate", "rentpsf": "rentalRate",
+                  "expensetype": "expenseType", "recoverytype": "expenseType",
+                  "startdate": "startDate", "leasestart": "startDate", "commencement": "startDate",
+                  "enddate": "endDate", "leaseend": "endDate", "expiration": "endDate",
+                  "percentincrease": "percentIncrease", "escalation": "percentIncrease",
+                  "escalationtype": "escalationType", "escalationbasis": "escalationType",
+                  "escalationfloor": "escalationFloor", "floor": "escalationFloor",
+                  "escalationcap": "escalationCap", "cap": "escalationCap",
+                  "lagmonths": "lagMonths", "lag": "lagMonths",
+                  "adjustmonth": "adjustMonth", "escalationmonth": "adjustMonth",
+                  "firstmodays": "firstMoDays", "lastmodays": "lastMoDays", "fullmonthrent": "fullMonthRent"}
+
+REQUIRED_COLUMNS = ["tenantName", "suite", "occupiedSF", "rentalRate", "expenseType", "startDate", "endDate"]
+
+#a schedule export has these instead of startDate and endDate
+SCHEDULE_COLUMNS = ["firstMoDays", "lastMoDays"]
+
+RESET_COLUMNS = ["tenantName", "suite", "resetDate", "rentalRate"]
+
+#dtypes the export columns are read with, dates are parsed separately so bad values can be rejected
+COLUMN_DTYPES = {"tenantName": str, "suite": str, "expenseType": str,
+                 "occupiedSF": np.float64, "rentalRate": np.float64, "percentIncrease": np.float64,
+                 "startDate": str, "endDate": str, "escalationType": str,
+                 "escalationFloor": np.float64, "escalationCap": np.float64, "lagMonths": np.float64, "adjustMonth": np.float64,
+                 "firstMoDays": np.float64, "lastMoDays": np.float64, "fullMonthRent": np.float64}
+
+#%%
+def _key(column):
+    return re.sub("[^a-z0-9]", "", str(column).lower())
+
+#maps the export's own headers to lease term columns
+def _columnMap(columns):
+    mapping = {}
+    for column in columns:
+        target = COLUMN_ALIASES.get(_key(column))
+        if target is not None and target not in mapping.values():
+            mapping[column] = target
+
+    required = REQUIRED_COLUMNS
+    if _isSchedule(mapping):
+        required = [column for column in REQUIRED_COLUMNS if column not in ("startDate", "endDate")]
+    missing = [column for column in required if column not in mapping.values()]
+    if missing:
+        raise ValueError("rent roll export is missing columns: %s" % ", ".join(missing))
+    return mapping
+
+def _isSchedule(mapping):
+    targets = set(mapping.values())
+    return set(SCHEDULE_COLUMNS) <= targets and not {"startDate", "endDate"} & targets
+
+#one lease term per run of consecutive months of a tenant's suite at the same SF in a lease-month
+#schedule, returns (lease terms, rate changes within the terms as resets)
+def _leaseTerms(schedule, months):
+    periods = core.period(pd.to_datetime(months).values)
+    order = np.lexsort((periods, schedule["suite"].values, schedule["tenantName"].values))
+    schedule, periods = schedule.iloc[order].reset_index(drop=True), periods[order]
+
+    #a term starts at a new tenant, suite or SF or after a gap in the months
+    keys = schedule[["tenantName", "suite", "occupiedSF"]]
+    same_lease = (keys == keys.shift()).all(axis=1).values
+    starts = ~same_lease | (np.diff(periods, prepend=periods[0] - 2) != 1)
+    first = np.flatnonzero(starts)
+    last = np.append(first[1:] - 1, len(schedule) - 1)
+
+    first_days = schedule["firstMoDays"].fillna(0).values[first].astype(int)
+    last_days = schedule["lastMoDays"].fillna(0).values[last].astype(int)
+    start = core.CALENDAR.monthStart[periods[first]] + np.where(
+        first_days > 0, core.CALENDAR.days[periods[first]] - first_days, 0).astype("timedelta64[D]")
+    end = np.where(last_days > 0, core.CALENDAR.monthStart[periods[last]] + (last_days - 1).astype("timedelta64[D]"),
+                   core.CALENDAR.monthEnd[periods[last]])
+
+    #the exported rentalRate is rounded to cents, the full month rent gives the rate the rent came from
+    rate = schedule["rentalRate"].values.astype(float)
+    if "fullMonthRent" in schedule:
+        sf = schedule["occupiedSF"].values
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rate = np.where(sf > 0, schedule["fullMonthRent"].values * 12 / sf, rate)
+    rate = np.where(np.isnan(rate), schedule["rentalRate"].values, rate)
+    changed = np.flatnonzero(~starts & (rate != np.roll(rate, 1)))
+
+    resets = pd.DataFrame({"tenantName": schedule["tenantName"].values[changed],
+                           "suite": schedule["suite"].values[changed],
+                           "resetDate": core.CALENDAR.monthStart[periods[changed]],
+                           "rentalRate": rate[changed]}, columns=RESET_COLUMNS)
+
+    leases = schedule.iloc[first].drop(columns=[column for column in SCHEDULE_COLUMNS + ["fullMonthRent"]
+                                                if column in schedule]).reset_index(drop=True)
+    leases["rentalRate"] = rate[first]
+    leases["startDate"] = start
+    leases["endDate"] = end
+    leases["percentIncrease"] = 0.0
+    return leases, resets
+
+#%%
+#cleans one chunk of lease terms, returns (valid leases, rejected rows with a reason)
+def validateLeases(leases):
+    leases = leases.copy()
+    leases["tenantName"] = leases["tenantName"].str.strip()
+    leases["suite"] = leases["suite"].str.strip()
+    leases["expenseType"] = leases["expenseType"].str.strip().str.upper()
+    leases["startDate"] = pd.to_datetime(leases["startDate"], errors="coerce")
+    leases["endDate"] = pd.to_datetime(leases["endDate"], errors="coerce")
+    if "percentIncrease" not in leases:
+        leases["percentIncrease"] = 0.0
+    leases["percentIncrease"] = leases["percentIncrease"].fillna(0.0)
+    if "escalationType" in leases:
+        leases["escalationType"] = leases["escalationType"].fillna("fixed").str.strip().str.lower()
+
+    #checks run on the whole chunk, the first failing check is the reason given
+    checks = [("missing tenant", leases["tenantName"].isnull() | (leases["tenantName"] == "")),
+              ("missing or bad start date", leases["startDate"].isnull()),
+              ("missing or bad end date", leases["endDate"].isnull()),
+              ("end date before start date", leases["endDate"] < leases["startDate"]),
+              ("occupied SF must be positive", ~(leases["occupiedSF"] > 0)),
+              ("rental rate must be zero or more", ~(leases["rentalRate"] >= 0)),
+              ("missing expense type", leases["expenseType"].isnull())]
+    if "escalationType" in leases:
+        checks.append(("unknown escalation type", ~leases["escalationType"].isin(ESCALATION_TYPES)))
+
+    reason = pd.Series(None, index=leases.index, dtype=object)
+    for message, failed in checks:
+        reason = reason.where(reason.notnull() | ~failed, message)
+
+    rejected = leases[reason.notnull()].assign(reason=reason[reason.notnull()])
+    return leases[reason.isnull()], rejected
+
+#%%
+#reads a rent roll export in chunks of chunksize rows (Excel files and schedule exports are read in one go,
+#a lease's months can't be split across chunks)
+def readRentRoll(path, chunksize=100000, sheet_name=0):
+    excel = os.path.splitext(path)[1].lower() in (".xlsx", ".xlsm", ".xls")
+
+    if excel:
+        header = pd.read_excel(path, sheet_name=sheet_name, nrows=0).columns
+    else:
+        header = pd.read_csv(path, nrows=0).columns
+    mapping = _columnMap(header)
+    dtypes = {column: COLUMN_DTYPES[target] for column, target in mapping.items()}
+    schedule = _isSchedule(mapping)
+    usecols = [header[0]] + list(mapping) if schedule else list(mapping)
+
+    if excel:
+        chunks = [pd.read_excel(path, sheet_name=sheet_name, usecols=usecols, dtype=dtypes)]
+    elif schedule:
+        chunks = [pd.read_csv(path, usecols=usecols, dtype=dtypes)]
+    else:
+        chunks = pd.read_csv(path, usecols=usecols, dtype=dtypes, chunksize=chunksize)
+
+    valid, rejected, resets = [], [], [pd.DataFrame(columns=RESET_COLUMNS)]
+    for chunk in chunks:
+        leases = chunk[list(mapping)].rename(columns=mapping)
+        if schedule:
+            leases, changes = _leaseTerms(leases, chunk[header[0]])
+            resets.append(changes)
+        good, bad = validateLeases(leases)
+        valid.append(good)
+        rejected.append(bad)
+
+    leases = pd.concat(valid, ignore_index=True)
+    rejected = pd.concat(rejected)
+    resets = pd.concat(resets, ignore_index=True)
+    resets["suite"] = resets["suite"].astype(str).str.strip()
+    resets["tenantName"] = resets["tenantName"].astype(str).str.strip()
+
+    #creates a named tuple so the lease terms, the rejected rows and the rate changes can be accessed easily
+
+    RentRollImport = namedtuple("RentRollImport", ["leases", "rejected", "resets"])
+    rentRollImport = RentRollImport(leases, rejected, resets)
+
+    return rentRollImport
+
+#%%
+#reads an export straight into a rent roll (same full / monthly / yearly tuple as newRentRoll)
+def importRentRoll(path, chunksize=100000, sheet_name=0):
+    imported = readRentRoll(path, chunksize, sheet_name)
+    resets = imported.resets if len(imported.resets) else None
+    return newRentRoll([newLeaseBatch(imported.leases, resets=resets)])
@@ -2,63 +2,47 @@
 import pandas as pd
 from datetime import date
 import numpy as np
-from collections import OrderedDict, namedtuple
-from dateutil.relativedelta import *
-from dateutil.rrule import rrule, MONTHLY
-from pandas.tseries.offsets import MonthEnd, YearEnd, DateOffset
+from collections import namedtuple
+
+try:
+    from . import core
+    from .escalations import escalatedRates
+    from .profiling import instrument
+except ImportError:
+    import core
+    from escalations import escalatedRates
+    from profiling import instrument
 
 #%%
 #newLease is used for fixed variable leases, if there are rent increases you need to use newLeaseSchedule
+@instrument
 def newLease(start_date,end_date,tenant_name,suite,rental_rate_psf,occupied_sf,expense_type):
     
-    #need to find the end of the last month or it wont be included, all index values use the last day of the month
-    end_date_month = pd.to_datetime(end_date) + MonthEnd(0) 
-    
-    #create the index date range for this particular lease
-    month_array = pd.date_range(start = start_date, end = end_date_month, freq="M")
-    
-    #actual_start_date =  start_date - datetime.timedelta(days=1)
-    #actual_end_date =  end_date + datetime.timedelta(days=1)
-    
+    #month by month rent comes from the numpy core, all index values use the last day of the month
+    rent = core.lease_rent(start_date, end_date, rental_rate_psf, occupied_sf)
+
     #setup the schedule DataFrame
     schedule = pd.DataFrame({'tenantName': tenant_name, 
                              'suite': suite,
                              'occupiedSF': occupied_sf,
-                             'rentalRate': rental_rate_psf,                        
+                             'rentalRate': rental_rate_psf,
+                             'fullMonthRent': rent.fullMonthRent,
+                             'isFirstMonth': rent.isFirstMonth,
+                             'isLastMonth': rent.isLastMonth,
+                             'firstMoDays': rent.firstMoDays,
+                             'lastMoDays': rent.lastMoDays,
+                             'partialDays': rent.partialDays,
+                             'collectedRent': rent.collectedRent,
+                             'expenseType': expense_type,
+                             'startYear': pd.to_datetime(start_date).year,
                             },
-                            index = month_array)
-    
-    schedule['fullMonthRent'] = (schedule['occupiedSF'] * schedule['rentalRate']) / 12
-    #need to round all partial cents up
-    schedule['fullMonthRent'] = round((schedule['fullMonthRent'] * 100),2)
-
-
-    #these check the month and year of the index to see if they are the first or last month to account for partial month leases
-    schedule['isFirstMonth'] = (pd.to_datetime(schedule.index).month == pd.to_datetime(start_date).month) & (pd.to_datetime(schedule.index).year == pd.to_datetime(start_date).year)
-    schedule['isLastMonth'] = (pd.to_datetime(schedule.index).month == pd.to_datetime(end_date).month) & (pd.to_datetime(schedule.index).year == pd.to_datetime(end_date).year)
-
-    #then we count how many days are in the partial month
-    schedule['firstMoDays'] = np.where(schedule['isFirstMonth']==True, (pd.to_datetime(schedule.index).day - pd.to_datetime(start_date).day + 1), 0)
-    schedule['lastMoDays'] = np.where(schedule['isLastMonth']==True, pd.to_datetime(end_date).day, 0)
-
-    schedule['partialDays'] = schedule['firstMoDays'] + schedule['lastMoDays']
-
-    #calculates the rent for a partial month lease
-    schedule['collectedRent'] = (schedule['fullMonthRent'] / pd.to_datetime(schedule.index).day) * schedule['partialDays']
-    schedule['collectedRent'] = round((schedule['collectedRent'] * 100),2)
-    
-    #puts the full month rent amount into the schedule of collected rent
-    
-    
-    schedule['collectedRent'] = schedule['collectedRent'].replace(0.0, schedule['fullMonthRent'])
-    schedule['expenseType'] = expense_type
-    schedule['startYear'] = pd.to_datetime(start_date).year
+                            index = pd.DatetimeIndex(rent.monthEnd))
     
     schedule = schedule.round(2)
     
     #create stats for use outside of rent schedule
     
-    months_in_lease = int(np.around((pd.to_datetime(end_date) - pd.to_datetime(start_date))/np.timedelta64(1, 'M')))
+    months_in_lease = core.months_between(start_date, end_date)
     
     stats = pd.Series([start_date, 
                        end_date, 
@@ -82,51 +66,33 @@ def newLease(start_date,end_date,tenant_name,suite,rental_rate_psf,occupied_sf,e
 
 #Rent Schedule for one tenant
 #Use this to do % increases for the same tenant so you dont have to create a seperate lease item for every year
+@instrument
 def newLeaseSchedule(start_date, end_date, tenant_name, suite, start_rental_rate_psf, occupied_sf, expense_type, percent_increase):
-    #set variables
-    first_year_end = pd.to_datetime(start_date) + YearEnd(0)
-    end_year = pd.to_datetime(end_date) + YearEnd(0)
-
-    i = end_year.year - first_year_end.year
-
-    leaseArray = []
-    rolling_start_date = start_date
-    
-    #run loop for each years lease, each lease is added to the Array
-    for year in range(0,i):
-        rolling_end_date = rolling_start_date + YearEnd(1)
-        yearLease = newLease(rolling_start_date,rolling_end_date,tenant_name,suite,start_rental_rate_psf,occupied_sf,expense_type)
-        start_rental_rate_psf = start_rental_rate_psf * (1 + percent_increase)
-        rolling_start_date = rolling_end_date + DateOffset()
-        leaseArray.append(yearLease)
-    #need to add the final year seperately
-    finalYear = newLease(rolling_start_date,end_date,tenant_name,suite,start_rental_rate_psf,occupied_sf,expense_type)
-    leaseArray.append(finalYear)
-
-    #combine all the years leases into one data frame
-    tenantRentSchedule = pd.DataFrame()
-    for lease in leaseArray:
-        tenantRentSchedule = pd.concat([tenantRentSchedule, lease.schedule])
-
-    tenantRentSchedule.sort_index(inplace=True)
-
-    #overwrite the columns for firstMoRent, lastMoRent etc. - 
-
-    tenantRentSchedule['isFirstMonth'] = (pd.to_datetime(tenantRentSchedule.index).month == pd.to_datetime(start_date).month) & (pd.to_datetime(tenantRentSchedule.index).year == pd.to_datetime(start_date).year)
-    tenantRentSchedule['isLastMonth'] = (pd.to_datetime(tenantRentSchedule.index).month == pd.to_datetime(end_date).month) & (pd.to_datetime(tenantRentSchedule.index).year == pd.to_datetime(end_date).year)
-
-    #then we count how many days are in the partial month
-    tenantRentSchedule['firstMoDays'] = np.where(tenantRentSchedule['isFirstMonth']==True, (pd.to_datetime(tenantRentSchedule.index).day - pd.to_datetime(start_date).day + 1), 0)
-    tenantRentSchedule['lastMoDays'] = np.where(tenantRentSchedule['isLastMonth']==True, pd.to_datetime(end_date).day, 0)
-
-    tenantRentSchedule['partialDays'] = tenantRentSchedule['firstMoDays'] + tenantRentSchedule['lastMoDays']
-
-    tenantRentSchedule['startYear'] = pd.to_datetime(start_date).year
+    #month by month rent from the numpy core, the rate goes up every 1/1 after the start year
+    rent = core.lease_rent(start_date, end_date, start_rental_rate_psf, occupied_sf, percent_increase)
+
+    tenantRentSchedule = pd.DataFrame({'tenantName': tenant_name,
+                                       'suite': suite,
+                                       'occupiedSF': occupied_sf,
+                                       'rentalRate': rent.rentalRate,
+                                       'fullMonthRent': rent.fullMonthRent,
+                                       'isFirstMonth': rent.isFirstMonth,
+                                       'isLastMonth': rent.isLastMonth,
+                                       'firstMoDays': rent.firstMoDays,
+                                       'lastMoDays': rent.lastMoDays,
+                                       'partialDays': rent.partialDays,
+                                       'collectedRent': rent.collectedRent,
+                                       'expenseType': expense_type,
+                                       'startYear': pd.to_datetime(start_date).year,
+                                      },
+                                      index = pd.DatetimeIndex(rent.monthEnd))
+
+    tenantRentSchedule = tenantRentSchedule.round(2)
 
     #set output to match the newLease output
-    months_in_lease = int(np.around((pd.to_datetime(end_date) - pd.to_datetime(start_date))/np.timedelta64(1, 'M')))
+    months_in_lease = core.months_between(start_date, end_date)
     avg_rental_rate = ((tenantRentSchedule['fullMonthRent'].mean()/ occupied_sf)*12)
-    avg_rental_rate = round((avg_rental_rate * 100),2)
+    avg_rental_rate = round(avg_rental_rate,2)
 
     stats = pd.Series([start_date, 
                        end_date, 
@@ -148,14 +114,51 @@ def newLeaseSchedule(start_date, end_date, tenant_name, suite, start_rental_rate
 
     return lease
 
+#%%
+#Rent schedules for a whole table of leases at once, without a newLease call per tenant
+#leases needs the columns tenantName, suite, occupiedSF, rentalRate, expenseType, startDate, endDate
+#and optionally percentIncrease (raises the rent every 1/1 like newLeaseSchedule)
+#leases with an escalationType column or market resets get their rates from escalatedRates (see escalations.py),
+#index and market are Series of index levels / market rent PSF by date, from_date leaves out the months before it
+#returns one DataFrame with the same columns as newLease.schedule that can go straight into newRentRoll
+@instrument
+def newLeaseBatch(leases, index=None, market=None, resets=None, upward_only=False, from_date=None):
+    start_dates = pd.to_datetime(leases['startDate'])
+    percent_increase = leases['percentIncrease'].fillna(0).values if 'percentIncrease' in leases else 0
+
+    rates = None
+    if 'escalationType' in leases or resets is not None:
+        rates = escalatedRates(leases, index, market, resets, upward_only, from_date)
+
+    rent = core.lease_rents(start_dates.values, pd.to_datetime(leases['endDate']).values,
+                            leases['rentalRate'].values, leases['occupiedSF'].values, percent_increase, rates, from_date)
+
+    #every lease column is repeated for each of the lease's months
+    rows = rent.lease
+    schedule = pd.DataFrame({'tenantName': leases['tenantName'].values[rows],
+                             'suite': leases['suite'].values[rows],
+                             'occupiedSF': leases['occupiedSF'].values[rows],
+                             'rentalRate': np.round(rent.rentalRate, 2),
+                             'fullMonthRent': rent.fullMonthRent,
+                             'isFirstMonth': rent.isFirstMonth,
+                             'isLastMonth': rent.isLastMonth,
+                             'firstMoDays': rent.firstMoDays,
+                             'lastMoDays': rent.lastMoDays,
+                             'partialDays': rent.partialDays,
+                             'collectedRent': rent.collectedRent,
+                             'expenseType': leases['expenseType'].values[rows],
+                             'startYear': start_dates.dt.year.values[rows],
+                            },
+                            index = pd.DatetimeIndex(rent.monthEnd))
+
+    return schedule
+
 #%%
 #now we need to make a DataFrame similar to the one in newLease, that holds all the seperate leases with months as index
 
+@instrument
 def newRentRoll(leaseArray):
-    propertyRentSchedule = pd.DataFrame()
-
-    for lease in leaseArray:
-        propertyRentSchedule = pd.concat([propertyRentSchedule, lease])
+    propertyRentSchedule = pd.concat(leaseArray) if len(leaseArray) else pd.DataFrame()
 
     propertyRentSchedule.sort_index(inplace=True)
     #propertyRentSchedule.to_csv('propertyRentSchedule.csv')
@@ -163,7 +166,7 @@ def newRentRoll(leaseArray):
     ####
     monthlyRentSchedule = pd.DataFrame()
     monthlyRentSchedule['monthsRent'] = propertyRentSchedule.groupby(propertyRentSchedule.index)['collectedRent'].sum()
-    monthlyRentSchedule['monthsRent'] = round((monthlyRentSchedule['monthsRent'] * 100),2)
+    monthlyRentSchedule['monthsRent'] = round(monthlyRentSchedule['monthsRent'],2)
     monthlyRentSchedule['leaseCount'] = propertyRentSchedule.index.value_counts()
     monthlyRentSchedule['year'] = pd.to_datetime(monthlyRentSchedule.index).year
 
@@ -174,7 +177,7 @@ def newRentRoll(leaseArray):
     ####
     yearlyRentSchedule = pd.DataFrame()
     yearlyRentSchedule['yearsRent'] = monthlyRentSchedule.groupby(monthlyRentSchedule['year'])['monthsRent'].sum()
-    yearlyRentSchedule['yearsRent'] = round((yearlyRentSchedule['yearsRent'] * 100),2)
+    yearlyRentSchedule['yearsRent'] = round(yearlyRentSchedule['yearsRent'],2)
     
     #creates a named tuple so the three versions can be accessed easily
     
@@ -190,18 +193,19 @@ def newExpense(expense,amount,year,frequency=1,addTo=(pd.DataFrame())):
     if addTo.empty:
         return new
     else:
-        return addTo.append(new,ignore_index=True)
+        return pd.concat([addTo, new], ignore_index=True)
 
 
 #%%
+@instrument
 def calculateExpenses(rent_roll,expenses,building_size,percent_increase=0.03,expenses_year=2019):
  rent_roll = rent_roll.full
 
  rent_roll['prorataShare'] = (rent_roll.occupiedSF / building_size)
- #change the expenses on NNN to be the FV of the expenses so it changes from year to year
- rent_roll['expenseAmount'] = pd.np.where(rent_roll.expenseType.str.contains("NNN"), (rent_roll.occupiedSF / building_size) * np.fv(percent_increase, rent_roll.index.year - expenses_year, 0, -1*expenses),
- pd.np.where(rent_roll.expenseType.str.contains("BASE YEAR"),((rent_roll.occupiedSF / building_size) * (expenses - np.fv(percent_increase, rent_roll.startYear - rent_roll.index.year, 0, -1*expenses))/12), 0))
+ #change the expenses on NNN to be the FV of the expenses so it changes from year to year, both types are monthly amounts
+ rent_roll['expenseAmount'] = np.where(rent_roll.expenseType.str.contains("NNN"), (rent_roll.occupiedSF / building_size) * core.future_value(percent_increase, rent_roll.index.year - expenses_year, expenses)/12,
+ np.where(rent_roll.expenseType.str.contains("BASE YEAR"),((rent_roll.occupiedSF / building_size) * (expenses - core.future_value(percent_increase, rent_roll.startYear - rent_roll.index.year, expenses))/12), 0))
 
- rent_roll['expenseAmount'] = round((rent_roll['expenseAmount'] * 100),2)
+ rent_roll['expenseAmount'] = round(rent_roll['expenseAmount'],2)
 
  return rent_roll
@@ -0,0 +1,82 @@
+#%%
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+
+from . import core
+
+#%% [markdown]
+# # Leasing Costs
+# ---
+# Leasing commissions and tenant improvement (TI) spend for a whole table of leases at once. The lease
+# table is the same one **_newLeaseBatch_** takes (tenantName, suite, occupiedSF, rentalRate, expenseType,
+# startDate, endDate and optionally percentIncrease), so costs for the rent roll and for any rollover
+# leases added to it come from the same terms.
+#
+# Commissions:
+# * **commission_rates**: percent of the rent in each lease year, the last rate carries on for the rest
+#   of the term, e.g. (0.06, 0.06, 0.04) is 6% of years 1-2 and 4% of year 3 on
+# * **procuring_share**: part of the commission paid to the procuring (tenant's) broker, the rest goes
+#   to the listing broker
+# * the whole commission is paid in the first month of the lease
+#
+# Tenant improvements:
+# * **ti_psf**: allowance per occupied SF, a tiPSF column in the lease table overrides it per lease
+# * **ti_months**: months the TI spend is spread over, starting **ti_lead_months** before the lease starts
+#
+# **_leasingCosts_** returns a per lease table and a month by month capital cost series indexed by month
+# end like the rent roll.
+
+#%%
+def leasingCosts(leases, commission_rates=(0.06,), procuring_share=0.0, ti_psf=0.0, ti_months=1, ti_lead_months=0):
+    start_dates = pd.to_datetime(leases['startDate']).values
+    percent_increase = leases['percentIncrease'].fillna(0).values if 'percentIncrease' in leases else 0
+    rent = core.lease_rents(start_dates, pd.to_datetime(leases['endDate']).values,
+                            leases['rentalRate'].values, leases['occupiedSF'].values, percent_increase)
+    count = len(leases)
+
+    #lease year of every schedule month (0 for the first 12 months) picks the commission rate
+    lease_month = rent.period - core.period(start_dates)[rent.lease]
+    rates = np.asarray(commission_rates, dtype=float)
+    month_commission = rent.collectedRent * rates[np.minimum(lease_month // 12, len(rates) - 1)]
+
+    lease_value = np.bincount(rent.lease, weights=rent.collectedRent, minlength=count)
+    commission = np.round(np.bincount(rent.lease, weights=month_commission, minlength=count), 2)
+    procuring = np.round(commission * procuring_share, 2)
+
+    ti_rate = leases['tiPSF'].fillna(ti_psf).values if 'tiPSF' in leases else np.full(count, float(ti_psf))
+    ti_cost = np.round(ti_rate * leases['occupiedSF'].values, 2)
+
+    costs = pd.DataFrame({'tenantName': leases['tenantName'].values,
+                          'suite': leases['suite'].values,
+                          'startDate': start_dates,
+                          'leaseValue': np.round(lease_value, 2),
+                          'commission': commission,
+                          'listingCommission': commission - procuring,
+                          'procuringCommission': procuring,
+                          'tenantImprovements': ti_cost,
+                          'totalCost': commission + ti_cost})
+    costs['costPSF'] = np.round(costs['totalCost'] / leases['occupiedSF'].values, 2)
+
+    #commissions land in the first lease month, TI is spread evenly over its months
+    first_period = core.period(start_dates)
+    ti_lease = np.repeat(np.arange(count), ti_months)
+    ti_period = first_period[ti_lease] - ti_lead_months + np.tile(np.arange(ti_months), count)
+
+    first = min(rent.period.min(), ti_period.min()) if count else 0
+    last = max(rent.period.max(), ti_period.max()) if count else -1
+    months = last - first + 1
+
+    monthly = pd.DataFrame({'commissions': np.bincount(first_period - first, weights=commission, minlength=months),
+                            'tenantImprovements': np.bincount(ti_period - first, weights=ti_cost[ti_lease] / ti_months,
+                                                              minlength=months)},
+                           index=pd.DatetimeIndex(core.CALENDAR.monthEnd[first:last + 1]))
+    monthly['leasingCosts'] = monthly['commissions'] + monthly['tenantImprovements']
+    monthly = monthly.round(2)
+
+    #creates a named tuple so the lease and monthly versions can be accessed easily
+
+    LeasingCosts = namedtuple("LeasingCosts", ["leases", "monthly"])
+    leasingCosts = LeasingCosts(costs, monthly)
+
+    return leasingCosts
@@ -0,0 +1,138 @@
+#%%
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+
+try:
+    from . import core
+except ImportError:
+    import core
+
+#%% [markdown]
+# # Rent Overrides
+# ---
+# Free rent, abatements, step changes and one-off adjustments are kept as a small table of overrides next
+# to the rent roll instead of splitting leases into several newLease calls. The base schedule is never
+# rebuilt: **_applyOverrides_** resolves the overrides to (tenant, suite, month, delta) entries for the
+# affected months only and adds them in when the monthly and yearly totals are aggregated.
+#
+# Override kinds (**_newOverride_**):
+# * **free**: no rent from start through end
+# * **abatement**: amount is the fraction of rent abated (0.5 = half rent)
+# * **rate**: amount is the new rental rate PSF from start through end (or the end of the lease)
+# * **adjustment**: amount is added to the rent in each month from start through end (negative for credits),
+#   months outside the lease are allowed so fees after move out can be booked too
+#
+# Free rent and abatements apply to the rent after any rate change for the same month.
+
+OVERRIDE_KINDS = ["free", "abatement", "rate", "adjustment"]
+
+#%%
+#If you dont pass it an addTo dataframe it will create a new data frame with your override
+def newOverride(tenant_name, suite, start, kind, amount=0, end=None, addTo=(pd.DataFrame())):
+    if kind not in OVERRIDE_KINDS:
+        raise ValueError("override kind must be one of %s, not %r" % (", ".join(OVERRIDE_KINDS), kind))
+
+    #one month unless an end is given, rate changes run to the end of the lease
+    if end is None and kind != "rate":
+        end = start
+
+    new = pd.DataFrame.from_records([{"tenantName": tenant_name,
+                                      "suite": suite,
+                                      "start": pd.Timestamp(start) + pd.offsets.MonthEnd(0),
+                                      "end": pd.Timestamp(end) + pd.offsets.MonthEnd(0) if end is not None else pd.NaT,
+                                      "kind": kind,
+                                      "amount": amount}])
+
+    if addTo.empty:
+        return new
+    else:
+        return pd.concat([addTo, new], ignore_index=True)
+
+#%%
+#one row per override per month it covers
+def _expand(overrides, last_month):
+    start = core.period(overrides["start"].values)
+    end = core.period(overrides["end"].fillna(last_month).values)
+    counts = np.maximum(end - start + 1, 0)
+
+    entry = np.repeat(np.arange(len(overrides)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    #tenant and suite are matched as text so a suite given as 1 finds the rent roll's "1"
+    expanded = overrides.iloc[entry].reset_index(drop=True)
+    expanded["tenantName"] = expanded["tenantName"].astype(str)
+    expanded["suite"] = expanded["suite"].astype(str)
+    expanded["month"] = pd.DatetimeIndex(core.CALENDAR.monthEnd[start[entry] + offsets])
+    return expanded
+
+#%%
+#resolves the overrides against the rent roll to the rent change in each affected lease month
+def resolveOverrides(rent_roll, overrides):
+    full = rent_roll.full if hasattr(rent_roll, "full") else rent_roll
+    columns = ["tenantName", "suite", "month", "delta"]
+    if overrides is None or overrides.empty:
+        return pd.DataFrame(columns=columns)
+
+    expanded = _expand(overrides, full.index.max())
+    adjustments = expanded[expanded["kind"] == "adjustment"].assign(delta=lambda t: t["amount"])
+    factors = expanded[expanded["kind"] != "adjustment"]
+
+    resolved = [adjustments[columns]]
+    if len(factors):
+        #only the rows of tenants with an override are looked at
+        rows = full[full["tenantName"].astype(str).isin(factors["tenantName"].unique())]
+        rows = pd.DataFrame({"tenantName": rows["tenantName"].astype(str).values,
+                             "suite": rows["suite"].astype(str).values,
+                             "month": rows.index,
+                             "rentalRate": rows["rentalRate"].values,
+                             "occupiedSF": rows["occupiedSF"].values,
+                             "collectedRent": rows["collectedRent"].values})
+        matched = factors.merge(rows, on=["tenantName", "suite", "month"])
+
+        #a rate change scales the month's rent (so partial months stay prorated), the latest one wins
+        rate = matched[matched["kind"] == "rate"].sort_values("start")
+        rate = rate.assign(factor=np.where(rate["rentalRate"] > 0, rate["amount"] / rate["rentalRate"], 0))
+        rate_factor = rate.groupby(["tenantName", "suite", "month"])["factor"].last()
+
+        other = matched[matched["kind"] != "rate"]
+        other = other.assign(factor=np.where(other["kind"] == "free", 0.0, 1 - other["amount"]))
+        other_factor = other.groupby(["tenantName", "suite", "month"])["factor"].prod()
+
+        base = matched.groupby(["tenantName", "suite", "month"])[["collectedRent", "occupiedSF"]].first()
+        factor = rate_factor.reindex(base.index, fill_value=1.0) * other_factor.reindex(base.index, fill_value=1.0)
+
+        #a lease with no base rent gets the new rate on its SF
+        flat = rate.groupby(["tenantName", "suite", "month"])["amount"].last().reindex(base.index)
+        changed = np.where((base["collectedRent"] == 0) & flat.notnull(),
+                           flat.fillna(0) * base["occupiedSF"] / 12 * other_factor.reindex(base.index, fill_value=1.0),
+                           base["collectedRent"] * factor)
+
+        resolved.append(pd.DataFrame({"delta": np.round(changed - base["collectedRent"].values, 2)},
+                                     index=base.index).reset_index())
+
+    resolved = pd.concat(resolved, ignore_index=True)
+    return resolved[resolved["delta"] != 0].reset_index(drop=True)[columns]
+
+#%%
+#returns the rent roll tuple with the overrides added into monthly and yearly, full stays the base schedule
+def applyOverrides(rent_roll, overrides):
+    deltas = resolveOverrides(rent_roll, overrides)
+    byMonth = deltas.groupby("month")["delta"].sum()
+
+    monthlyRentSchedule = rent_roll.monthly.reindex(rent_roll.monthly.index.union(byMonth.index))
+    monthlyRentSchedule['overrideAmount'] = byMonth.reindex(monthlyRentSchedule.index, fill_value=0.0)
+    monthlyRentSchedule['monthsRent'] = round(monthlyRentSchedule['monthsRent'].fillna(0) + monthlyRentSchedule['overrideAmount'],2)
+    monthlyRentSchedule['leaseCount'] = monthlyRentSchedule['leaseCount'].fillna(0).astype(int)
+    monthlyRentSchedule['year'] = pd.to_datetime(monthlyRentSchedule.index).year
+
+    yearlyRentSchedule = pd.DataFrame()
+    yearlyRentSchedule['yearsRent'] = round(monthlyRentSchedule.groupby('year')['monthsRent'].sum(),2)
+    yearlyRentSchedule['overrideAmount'] = round(monthlyRentSchedule.groupby('year')['overrideAmount'].sum(),2)
+
+    #creates a named tuple so the three versions can be accessed easily
+
+    RentRoll = namedtuple("RentRoll", ["full", "monthly", "yearly"])
+    rentRoll = RentRoll(rent_roll.full, monthlyRentSchedule, yearlyRentSchedule)
+
+    return rentRoll
@@ -0,0 +1,173 @@
+#%%
+import numpy as np
+import pandas as pd
+
+from . import core
+from .cashflow import cashFlow
+from .leases import calculateExpenses
+
+#%% [markdown]
+# # Portfolio
+# ---
+# A **_Portfolio_** holds the rent rolls, expenses and loans of many properties. Every property added is
+# boiled down once to two tables with compact dtypes (categorical names, float32 SF and rates):
+# * **full**: the rent roll rows under a (portfolio, property, suite, month) index
+# * **monthly**: one row per property month with rent, recoveries, operating expenses, NOI, debt service
+#   and levered cash flow (from cashFlow) plus leased SF and lease count
+#
+# Portfolio, market or fund rollups and property comparisons are grouped reductions over the monthly
+# table. Updating a property only rebuilds that property's tables, the combined tables are put back
+# together the next time they're used.
+#
+#     portfolio = Portfolio("Fund I")
+#     portfolio.addProperty("Prosperity", rentRoll, expenses=45000, amortization=loan, market="Austin", building_size=9000)
+#     portfolio.rollup("market", period="year")
+
+MONTHLY_COLUMNS = ["rent", "recoveries", "operatingExpenses", "noi", "debtService", "leveredCashFlow",
+                   "leasedSF", "leaseCount"]
+
+#flows are summed over a period, SF and lease counts are averaged over its months
+FLOW_COLUMNS = ["rent", "recoveries", "operatingExpenses", "noi", "debtService", "leveredCashFlow"]
+
+#%%
+class Portfolio:
+
+    def __init__(self, name="Portfolio"):
+        self.name = name
+        self._full = {}
+        self._monthly = {}
+        self._attributes = {}
+        self._combined = None
+
+    #adds a property or replaces one with the same name, expenses is the yearly operating expense total
+    #(or a newExpense table) and amortization an amortization_table, market and fund are labels to roll up by.
+    #recoveries come from calculateExpenses, it's run here if the rent roll has none yet and building_size is given
+    def addProperty(self, name, rent_roll, expenses=0, amortization=None, building_size=np.nan, market=None,
+                    fund=None, expense_growth=0.03, expenses_year=2019):
+        full = rent_roll.full
+        if "expenseAmount" not in full and not np.isnan(building_size) and not hasattr(expenses, "monthly"):
+            total = expenses["Yearly Expense"].sum() if isinstance(expenses, pd.DataFrame) else expenses
+            full = calculateExpenses(rent_roll, total, building_size, expense_growth, expenses_year)
+        flows = cashFlow(rent_roll, expenses, amortization, expense_growth=expense_growth, expenses_year=expenses_year)
+
+        periods = core.period(full.index.values) - core.period(flows.index[0])
+        monthly = flows[FLOW_COLUMNS].astype(np.float64)
+        monthly["leasedSF"] = np.bincount(periods, weights=full["occupiedSF"].values, minlength=len(flows)).astype(np.float32)
+        monthly["leaseCount"] = np.bincount(periods, minlength=len(flows)).astype(np.int32)
+
+        self._full[name] = pd.DataFrame({"tenantName": full["tenantName"].values,
+                                         "suite": full["suite"].astype(str).values,
+                                         "month": full.index.values,
+                                         "occupiedSF": full["occupiedSF"].values.astype(np.float32),
+                                         "rentalRate": full["rentalRate"].values.astype(np.float32),
+                                         "collectedRent": full["collectedRent"].values,
+                                         "expenseType": full["expenseType"].values})
+        self._monthly[name] = monthly
+        self._attributes[name] = {"market": market, "fund": fund, "buildingSize": float(building_size)}
+        self._combined = None
+
+    updateProperty = addProperty
+
+    def removeProperty(self, name):
+        del self._full[name], self._monthly[name], self._attributes[name]
+        self._combined = None
+
+    #%%
+    @property
+    def properties(self):
+        table = pd.DataFrame.from_dict(self._attributes, orient="index")
+        table.index.name = "property"
+        return table
+
+    #the combined tables are only rebuilt after a property changes
+    def _tables(self):
+        if self._combined is None:
+            names = list(self._full)
+            properties = pd.Categorical(names)
+
+            full = pd.concat([self._full[name] for name in names], ignore_index=True) if names else \
+                pd.DataFrame(columns=["tenantName", "suite", "month", "occupiedSF", "rentalRate", "collectedRent", "expenseType"])
+            rows = np.repeat(np.arange(len(names)), [len(self._full[name]) for name in names])
+            full.index = pd.MultiIndex.from_arrays([pd.Categorical([self.name] * len(full)),
+                                                    properties.take(rows) if len(names) else pd.Categorical([]),
+                                                    pd.Categorical(full.pop("suite")),
+                                                    pd.DatetimeIndex(full.pop("month"))],
+                                                   names=["portfolio", "property", "suite", "month"])
+            full["tenantName"] = full["tenantName"].astype("category")
+            full["expenseType"] = full["expenseType"].astype("category")
+
+            monthly = pd.concat([self._monthly[name] for name in names], keys=names, names=["property", "month"]) \
+                if names else pd.DataFrame(columns=MONTHLY_COLUMNS, index=pd.MultiIndex.from_arrays([[], []], names=["property", "month"]))
+            monthly = monthly.reset_index()
+            monthly.insert(0, "portfolio", pd.Categorical([self.name] * len(monthly)))
+            monthly["property"] = pd.Categorical(monthly["property"], categories=properties.categories)
+            monthly = monthly.set_index(["portfolio", "property", "month"])
+
+            self._combined = (full, monthly)
+        return self._combined
+
+    @property
+    def full(self):
+        return self._tables()[0]
+
+    @property
+    def monthly(self):
+        return self._tables()[1]
+
+    #%%
+    #monthly lines with the property's labels and the period key next to them
+    def _labeled(self, period):
+        monthly = self.monthly.reset_index()
+        attributes = self.properties
+        for column in ["market", "fund", "buildingSize"]:
+            monthly[column] = attributes[column].reindex(monthly["property"].astype(str)).values
+
+        periods = core.period(monthly["month"].values)
+        if period == "month":
+            monthly["period"] = monthly["month"]
+        elif period == "quarter":
+            monthly["period"] = pd.PeriodIndex(monthly["month"], freq="Q")
+        elif period == "year":
+            monthly["period"] = core.CALENDAR.year[periods]
+        else:
+            raise ValueError("period must be month, quarter or year, not %r" % period)
+        return monthly
+
+    #totals by portfolio, market, fund or property and period
+    def rollup(self, by="portfolio", period="year"):
+        monthly = self._labeled(period)
+        monthly["buildingSize"] = monthly["buildingSize"].fillna(0)
+
+        #properties are summed into each month first so SF and lease counts average over months, not properties
+        byMonth = monthly.groupby([by, "period", "month"], observed=True, dropna=False)[MONTHLY_COLUMNS + ["buildingSize"]].sum()
+        grouped = byMonth.groupby(level=[by, "period"], observed=True, dropna=False)
+        table = grouped[FLOW_COLUMNS].sum().join(grouped[["leasedSF", "leaseCount", "buildingSize"]].mean())
+        table["months"] = grouped.size()
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            table["occupancy"] = np.where(table["buildingSize"] > 0, table["leasedSF"] / table["buildingSize"], np.nan)
+            table["rentPSF"] = np.where(table["leasedSF"] > 0, table["rent"] * 12 / table["months"] / table["leasedSF"], 0)
+            table["dscr"] = np.where(table["debtService"] > 0, table["noi"] / table["debtService"], np.nan)
+
+        return table.round(4)
+
+    #one row per property with its totals and ratios between start and end (the whole horizon by default)
+    def compare(self, start=None, end=None):
+        monthly = self._labeled("month")
+        if start is not None:
+            monthly = monthly[monthly["month"] >= pd.Timestamp(start)]
+        if end is not None:
+            monthly = monthly[monthly["month"] <= pd.Timestamp(end) + pd.offsets.MonthEnd(0)]
+
+        grouped = monthly.groupby("property", observed=True)
+        table = grouped[FLOW_COLUMNS].sum().join(grouped[["leasedSF", "leaseCount", "buildingSize"]].mean())
+        table["months"] = grouped.size()
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            table["occupancy"] = table["leasedSF"] / table["buildingSize"]
+            table["rentPSF"] = np.where(table["leasedSF"] > 0, table["rent"] * 12 / table["months"] / table["leasedSF"], 0)
+            table["noiPSF"] = table["noi"] * 12 / table["months"] / table["buildingSize"]
+            table["dscr"] = np.where(table["debtService"] > 0, table["noi"] / table["debtService"], np.nan)
+            table["shareOfRent"] = table["rent"] / table["rent"].sum()
+
+        return table.round(4).sort_values("rent", ascending=False)
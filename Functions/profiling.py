@@ -0,0 +1,186 @@
+#%%
+import atexit
+import functools
+import inspect
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+#%% [markdown]
+# # Profiling
+# ---
+# Records wall time, rows produced and peak memory for every call to an instrumented function and for
+# every pipeline stage. It is switched on with an environment variable before the functions are imported:
+#
+#     PROFORMA_PROFILE=1 python -m Functions.cli existing properties/ -o out/
+#
+# When it is off **_instrument_** hands back the original function and **_stage_** a shared no-op context,
+# so there is nothing left on the call path. When it is on, the summary is printed to stderr at exit,
+# or written to PROFORMA_PROFILE_OUT (a .json path gets a Chrome trace, anything else a csv summary).
+
+ENABLED = os.environ.get("PROFORMA_PROFILE", "").lower() not in ("", "0", "false", "no", "off")
+
+_events = []
+_stack = []
+
+#%%
+class _NoStage(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NO_STAGE = _NoStage()
+
+#%%
+#counts rows in the tables returned by the lease, rent roll and finance functions
+def _rows(result):
+    if hasattr(result, "_fields"):
+        result = result[0]
+    if isinstance(result, list):
+        return sum(_rows(item) for item in result)
+    try:
+        return len(result)
+    except TypeError:
+        return 0
+
+#%%
+def _enter(name, kind):
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    current, peak = tracemalloc.get_traced_memory()
+
+    #the parent keeps the highest memory seen so far before the peak is reset for this frame
+    if _stack:
+        _stack[-1]["peak"] = max(_stack[-1]["peak"], peak)
+    tracemalloc.reset_peak()
+
+    frame = {"name": name, "kind": kind, "ts": time.time(), "started": time.perf_counter(),
+             "memory": current, "peak": current, "depth": len(_stack)}
+    _stack.append(frame)
+    return frame
+
+#%%
+def _exit(frame, rows):
+    duration = time.perf_counter() - frame["started"]
+    frame["peak"] = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+    _stack.pop()
+    if _stack:
+        _stack[-1]["peak"] = max(_stack[-1]["peak"], frame["peak"])
+
+    _events.append({"name": frame["name"],
+                    "kind": frame["kind"],
+                    "ts": frame["ts"],
+                    "duration": duration,
+                    "rows": rows,
+                    "peakBytes": frame["peak"] - frame["memory"],
+                    "depth": frame["depth"],
+                    "pid": os.getpid()})
+
+#%%
+#decorator for functions that should be recorded, generators are timed until they are exhausted
+def instrument(func):
+    if not ENABLED:
+        return func
+
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            frame = _enter(func.__name__, "call")
+            rows = 0
+            try:
+                for item in func(*args, **kwargs):
+                    rows += 1
+                    yield item
+            finally:
+                _exit(frame, rows)
+        return wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        frame = _enter(func.__name__, "call")
+        rows = 0
+        try:
+            result = func(*args, **kwargs)
+            rows = _rows(result)
+            return result
+        finally:
+            _exit(frame, rows)
+    return wrapper
+
+#%%
+@contextmanager
+def _stage(name):
+    frame = _enter(name, "stage")
+    try:
+        yield frame
+    finally:
+        _exit(frame, 0)
+
+#%%
+#context manager for a pipeline stage, e.g. with stage("rentRoll"): ...
+def stage(name):
+    if not ENABLED:
+        return _NO_STAGE
+    return _stage(name)
+
+#%%
+def events():
+    return list(_events)
+
+def reset():
+    del _events[:]
+
+def record(new_events):
+    _events.extend(new_events)
+
+#%%
+#one row per function or stage with call counts, time, rows and peak memory
+def summary(recorded=None):
+    import pandas as pd
+
+    recorded = pd.DataFrame(_events if recorded is None else recorded,
+                            columns=["name", "kind", "ts", "duration", "rows", "peakBytes", "depth", "pid"])
+    grouped = recorded.groupby(["kind", "name"])
+    table = pd.DataFrame({"calls": grouped.size(),
+                          "total (s)": grouped["duration"].sum(),
+                          "mean (ms)": grouped["duration"].mean() * 1000,
+                          "max (ms)": grouped["duration"].max() * 1000,
+                          "rows": grouped["rows"].sum(),
+                          "peak (MB)": grouped["peakBytes"].max() / 2**20})
+    return table.sort_values("total (s)", ascending=False)
+
+#%%
+#writes the events in the Chrome trace format, open with chrome://tracing or https://ui.perfetto.dev
+def dumpChromeTrace(path, recorded=None):
+    recorded = _events if recorded is None else recorded
+    trace = [{"name": event["name"],
+              "cat": event["kind"],
+              "ph": "X",
+              "ts": event["ts"] * 1e6,
+              "dur": event["duration"] * 1e6,
+              "pid": event["pid"],
+              "tid": event["pid"],
+              "args": {"rows": event["rows"], "peakMB": round(event["peakBytes"] / 2**20, 3)}}
+             for event in recorded]
+    with open(path, "w") as f:
+        json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+
+#%%
+def _dumpAtExit():
+    if not _events:
+        return
+    out = os.environ.get("PROFORMA_PROFILE_OUT")
+    if not out:
+        print(summary().round(4).to_string(), file=sys.stderr)
+    elif out.endswith(".json"):
+        dumpChromeTrace(out)
+    else:
+        summary().to_csv(out)
+
+if ENABLED:
+    atexit.register(_dumpAtExit)
@@ -0,0 +1,222 @@
+#%%
+import os
+import time
+import pandas as pd
+from collections import namedtuple
+
+from .leases import newLeaseBatch, newRentRoll, calculateExpenses
+from .ingest import readRentRoll
+from .finance import amortization_table
+from .cashflow import cashFlow
+from .profiling import stage
+
+#%% [markdown]
+# # Proforma Runs
+# ---
+# A property is described by a folder of input tables:
+# * **property.csv**: one row with name, building_size and optionally expense_growth, expenses_year
+# * **leases.csv**: start_date, end_date, tenant_name, suite, rental_rate_psf, occupied_sf, expense_type
+#   and optionally percent_increase (raises the rent every 1/1 like newLeaseSchedule), any rent roll
+#   export readRentRoll understands works too
+# * **expenses.csv**: expense, amount, year and optionally frequency
+# * **loan.csv** (optional): principal, interest_rate, years and optionally addl_principal, annual_payments, start_date
+# * **construction.csv** (construction deals): item, amount
+#
+# A manifest csv can be used instead of folders, one row per property with the property.csv columns
+# plus the paths to its leases, expenses, loan and construction files.
+
+PROPERTY_FILES = {"leases": "leases.csv",
+                  "expenses": "expenses.csv",
+                  "loan": "loan.csv",
+                  "construction": "construction.csv"}
+
+STAGES = ["load", "leases", "rentRoll", "expenses", "loan", "cashFlow", "write"]
+
+#%%
+def _readTable(path, dates=()):
+    if path is None or not os.path.exists(path):
+        return None
+    table = pd.read_csv(path)
+    for column in dates:
+        if column in table:
+            table[column] = pd.to_datetime(table[column]).dt.date
+    return table
+
+#%%
+#settings is a single property.csv or manifest row, file paths are relative to base_dir
+def loadProperty(settings, base_dir, deal_type="existing"):
+    settings = pd.Series(settings)
+
+    paths = {}
+    for key, default in PROPERTY_FILES.items():
+        path = settings.get(key)
+        if path is None or pd.isnull(path):
+            path = default
+        paths[key] = os.path.join(base_dir, path)
+
+    if not os.path.exists(paths["leases"]):
+        raise FileNotFoundError("no lease table for %s at %s" % (settings.get("name"), paths["leases"]))
+    leases, rejected, resets = readRentRoll(paths["leases"])
+    if len(rejected):
+        raise ValueError("%d lease(s) in %s can't be scheduled: %s"
+                         % (len(rejected), paths["leases"], "; ".join(rejected["reason"].unique())))
+
+    expenses = _readTable(paths["expenses"])
+    if expenses is None:
+        expenses = pd.DataFrame(columns=["expense", "amount", "year"])
+    if "frequency" not in expenses:
+        expenses["frequency"] = 1
+
+    #same layout as newExpense so the table can be used anywhere an expense table is expected
+    expenseTable = pd.DataFrame({"Expense": expenses["expense"],
+                                 "Amount": expenses["amount"],
+                                 "Frequency": expenses["frequency"],
+                                 "Yearly Expense": expenses["amount"] * expenses["frequency"],
+                                 "Year": expenses["year"]})
+
+    loan = _readTable(paths["loan"], dates=["start_date"])
+    loan = None if loan is None or loan.empty else loan.iloc[0]
+
+    construction = _readTable(paths["construction"])
+    if deal_type == "construction" and construction is None:
+        raise FileNotFoundError("construction deal %s has no construction budget at %s" % (settings.get("name"), paths["construction"]))
+
+    expenses_year = settings.get("expenses_year")
+    if pd.isnull(expenses_year):
+        expenses_year = int(expenseTable["Year"].min()) if not expenseTable.empty else 2019
+
+    expense_growth = settings.get("expense_growth")
+    if pd.isnull(expense_growth):
+        expense_growth = 0.03
+
+    PropertyInputs = namedtuple("PropertyInputs", ["name", "dealType", "buildingSize", "expenseGrowth", "expensesYear",
+                                                   "leases", "expenses", "loan", "construction", "resets"])
+    propertyInputs = PropertyInputs(str(settings["name"]), deal_type, float(settings["building_size"]),
+                                    float(expense_growth), int(expenses_year),
+                                    leases, expenseTable, loan, construction, resets if len(resets) else None)
+
+    return propertyInputs
+
+#%%
+#reads every property in a directory of property folders or listed in a manifest csv
+def findProperties(path):
+    if os.path.isdir(path):
+        found = []
+        for entry in sorted(os.listdir(path)):
+            folder = os.path.join(path, entry)
+            settings_path = os.path.join(folder, "property.csv")
+            if os.path.isfile(settings_path):
+                settings = pd.read_csv(settings_path).iloc[0].to_dict()
+                settings.setdefault("name", entry)
+                found.append((settings, folder))
+        return found
+
+    manifest = pd.read_csv(path)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    return [(row.to_dict(), base_dir) for _, row in manifest.iterrows()]
+
+#%%
+#the optional loan.csv columns as amortization_table keyword arguments
+def loanOptions(loan):
+    options = {}
+    for column in ["addl_principal", "annual_payments", "start_date"]:
+        if column in loan and not pd.isnull(loan[column]):
+            options[column] = loan[column]
+    if "annual_payments" in options:
+        options["annual_payments"] = int(options["annual_payments"])
+    return options
+
+#%%
+#runs one property through the lease, expense and finance functions, timings holds seconds spent in each stage
+def runProforma(inputs, timings=None):
+    if timings is None:
+        timings = {}
+
+    started = time.perf_counter()
+    with stage("leases"):
+        schedule = newLeaseBatch(inputs.leases, resets=inputs.resets)
+    timings["leases"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with stage("rentRoll"):
+        rentRoll = newRentRoll([schedule])
+    timings["rentRoll"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with stage("expenses"):
+        expenseAmount = inputs.expenses["Yearly Expense"].sum()
+        recoveries = calculateExpenses(rentRoll, expenseAmount, inputs.buildingSize,
+                                       percent_increase=inputs.expenseGrowth, expenses_year=inputs.expensesYear)
+    timings["expenses"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with stage("loan"):
+        amortization = None
+        if inputs.loan is not None:
+            loan = inputs.loan
+            amortization = amortization_table(loan["principal"], loan["interest_rate"], int(loan["years"]), **loanOptions(loan))
+    timings["loan"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with stage("cashFlow"):
+        flows = cashFlow(rentRoll, expenseAmount, amortization,
+                         expense_growth=inputs.expenseGrowth, expenses_year=inputs.expensesYear)
+    timings["cashFlow"] = time.perf_counter() - started
+
+    summary = pd.Series([inputs.name,
+                         inputs.dealType,
+                         len(inputs.leases),
+                         inputs.buildingSize,
+                         rentRoll.full["occupiedSF"].groupby(level=0).sum().max(),
+                         rentRoll.monthly.index.min(),
+                         rentRoll.monthly.index.max(),
+                         rentRoll.monthly["monthsRent"].sum(),
+                         expenseAmount,
+                         recoveries["expenseAmount"].sum(),
+                         amortization.stats["Principal"] if amortization is not None else 0,
+                         amortization.stats["Payment"] if amortization is not None else 0,
+                         amortization.stats["Total Interest"] if amortization is not None else 0,
+                         flows["noi"].sum(),
+                         flows["dscr"].min(),
+                         flows["leveredCashFlow"].sum(),
+                         inputs.construction["amount"].sum() if inputs.construction is not None else 0],
+                        index=["Property", "Deal Type", "Leases", "Building SF", "Peak Occupied SF", "First Month",
+                               "Last Month", "Total Rent", "Yearly Expenses", "Total Recoveries", "Loan Principal",
+                               "Loan Payment", "Total Interest", "Total NOI", "Min DSCR", "Levered Cash Flow",
+                               "Construction Cost"])
+
+    #creates a named tuple so the outputs can be accessed easily
+
+    Proforma = namedtuple("Proforma", ["name", "rentRoll", "expenses", "recoveries", "amortization", "cashFlow",
+                                       "summary", "timings"])
+    proforma = Proforma(inputs.name, rentRoll, inputs.expenses, recoveries, amortization, flows, summary, timings)
+
+    return proforma
+
+#%%
+#writes one property's tables to a spreadsheet (xlsx) or a folder of csv files
+def writeProforma(proforma, out_dir, output_format="xlsx"):
+    sheets = [("Summary", proforma.summary.to_frame("Value")),
+              ("Full Rent Roll", proforma.rentRoll.full),
+              ("Monthly Rent Roll", proforma.rentRoll.monthly),
+              ("Yearly Rent Roll", proforma.rentRoll.yearly),
+              ("Expenses", proforma.expenses),
+              ("Recoveries", proforma.recoveries)]
+    if proforma.amortization is not None:
+        sheets.append(("Amortization", proforma.amortization.schedule))
+    sheets.append(("Cash Flow", proforma.cashFlow))
+
+    safe_name = "".join(c if c.isalnum() or c in "-_." else "_" for c in proforma.name)
+
+    if output_format == "csv":
+        folder = os.path.join(out_dir, safe_name)
+        os.makedirs(folder, exist_ok=True)
+        for sheet, table in sheets:
+            table.to_csv(os.path.join(folder, sheet.lower().replace(" ", "_") + ".csv"))
+        return folder
+
+    path = os.path.join(out_dir, safe_name + ".xlsx")
+    with pd.ExcelWriter(path) as writer:
+        for sheet, table in sheets:
+            table.to_excel(writer, sheet_name=sheet)
+    return path
@@ -0,0 +1,121 @@
+#%%
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+
+from . import core
+
+#%% [markdown]
+# # Pool Recoveries
+# ---
+# Expense recoveries from separate expense pools (CAM, taxes, insurance, ...) instead of one expense total.
+# **_poolRecoveries_** works out every rent roll row's recovery from every pool at once as a
+# (lease months x pools) matrix built from a (pools x months) table of recoverable cost PSF.
+#
+# Pool options (**_newPool_**):
+# * **amount**: the pool's yearly cost at full occupancy in year dollars, grown by growth every year
+# * **variable_share**: part of the cost that moves with occupancy (the rest is fixed)
+# * **gross_up**: occupancy the variable part is grossed up to when the building is less occupied (None for no gross up)
+# * **cap**: yearly compounding cap on the tenant's cost PSF for controllable pools, counted from the
+#   tenant's first lease year (None for no cap)
+#
+# NNN tenants pay their share of each pool, BASE YEAR tenants pay their share of the increase over the
+# pool's cost in their start year, other expense types pay nothing. A tenant's share is its SF over the
+# building SF less the SF of tenants excluded from the pool (exclusions is a table of tenantName, suite, pool).
+#
+# The total is written to the rent roll's expenseAmount (like calculateExpenses) so cashFlow and the
+# rollups use it.
+
+#%%
+#If you dont pass it an addTo dataframe it will create a new data frame with your pool
+def newPool(pool, amount, year, growth=0.03, variable_share=0.0, gross_up=None, cap=None, addTo=(pd.DataFrame())):
+    new = pd.DataFrame.from_records([{"pool": pool,
+                                      "amount": amount,
+                                      "year": year,
+                                      "growth": growth,
+                                      "variableShare": variable_share,
+                                      "grossUp": gross_up if gross_up is not None else np.nan,
+                                      "cap": cap if cap is not None else np.nan}])
+
+    if addTo.empty:
+        return new
+    else:
+        return pd.concat([addTo, new], ignore_index=True)
+
+#%%
+def poolRecoveries(rent_roll, pools, building_size, exclusions=None):
+    full = rent_roll.full
+    periods = core.period(full.index.values)
+    first = periods.min()
+    months = np.arange(first, periods.max() + 1)
+    position = periods - first
+    year = core.CALENDAR.year[months]
+
+    sf = full["occupiedSF"].values.astype(float)
+    occupancy = np.bincount(position, weights=sf, minlength=len(months)) / building_size
+
+    #pools x months: cost at full occupancy, what the landlord spends and what can be recovered
+    amount = pools["amount"].values[:, None] * (1 + pools["growth"].values[:, None]) ** (year - pools["year"].values[:, None]) / 12
+    variable = pools["variableShare"].values[:, None]
+    gross_up = pools["grossUp"].values[:, None]
+    expense = amount * (1 - variable + variable * occupancy)
+    recoverable = amount * (1 - variable + variable * np.where(np.isnan(gross_up), occupancy, np.maximum(occupancy, gross_up)))
+
+    #rows x pools exclusions, excluded SF comes off the pool's denominator
+    excluded = np.zeros((len(full), len(pools)), dtype=bool)
+    if exclusions is not None and len(exclusions):
+        rows = pd.DataFrame({"tenantName": full["tenantName"].values, "suite": full["suite"].values, "row": np.arange(len(full))})
+        matched = rows.merge(exclusions, on=["tenantName", "suite"]).merge(
+            pd.DataFrame({"pool": pools["pool"].values, "column": np.arange(len(pools))}), on="pool")
+        excluded[matched["row"].values, matched["column"].values] = True
+    excluded_sf = np.stack([np.bincount(position, weights=sf * excluded[:, pool], minlength=len(months))
+                            for pool in range(len(pools))]) if len(pools) else np.zeros((0, len(months)))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cost_psf = np.where(building_size - excluded_sf > 0, recoverable / (building_size - excluded_sf), 0)
+
+    #average monthly cost PSF of each pool by year, start years before the rent roll use its first year
+    years = year - year[0]
+    year_psf = np.stack([np.bincount(years, weights=cost_psf[pool]) / np.bincount(years)
+                         for pool in range(len(pools))]) if len(pools) else np.zeros((0, years.max() + 1))
+    start_year = np.clip(full["startYear"].values.astype(int) - year[0], 0, years.max())
+    base_psf = year_psf[:, start_year].T
+
+    charge = cost_psf[:, position].T
+    cap = pools["cap"].values
+    capped = ~np.isnan(cap)
+    if capped.any():
+        lease_years = (year[position] - full["startYear"].values)[:, None]
+        limit = base_psf * (1 + np.nan_to_num(cap)) ** np.maximum(lease_years, 0)
+        charge = np.where(capped, np.minimum(charge, limit), charge)
+
+    expense_type = full["expenseType"].astype(str).str.upper()
+    nnn = expense_type.str.contains("NNN").values[:, None]
+    base_year = expense_type.str.contains("BASE YEAR").values[:, None]
+    charge = np.where(nnn, charge, np.where(base_year, np.maximum(charge - base_psf, 0), 0))
+    recovered = np.round(charge * sf[:, None] * ~excluded, 2)
+
+    byLease = pd.DataFrame(recovered, index=full.index, columns=pools["pool"].values)
+    byLease.insert(0, "suite", full["suite"].values)
+    byLease.insert(0, "tenantName", full["tenantName"].values)
+    byLease["total"] = recovered.sum(axis=1)
+
+    recovered_by_month = np.stack([np.bincount(position, weights=recovered[:, pool], minlength=len(months))
+                                   for pool in range(len(pools))]) if len(pools) else np.zeros((0, len(months)))
+    monthly = pd.DataFrame({"pool": np.repeat(pools["pool"].values, len(months)),
+                            "month": np.tile(core.CALENDAR.monthEnd[months], len(pools)),
+                            "expense": expense.ravel(),
+                            "recoverable": recoverable.ravel(),
+                            "recovered": recovered_by_month.ravel()})
+    monthly["unrecovered"] = monthly["expense"] - monthly["recovered"]
+    monthly = monthly.set_index(["pool", "month"]).round(2)
+
+    full['prorataShare'] = sf / building_size
+    full['expenseAmount'] = byLease["total"].values
+
+    #creates a named tuple so the lease and pool versions can be accessed easily
+
+    PoolRecoveries = namedtuple("PoolRecoveries", ["byLease", "monthly"])
+    poolRecoveries = PoolRecoveries(byLease, monthly)
+
+    return poolRecoveries
@@ -0,0 +1,147 @@
+#%%
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+
+try:
+    from . import core
+except ImportError:
+    import core
+
+#%% [markdown]
+# # Rent Roll Rollups
+# ---
+# **_newRollup_** turns a rent roll into one running total (cumulative sum) per metric over a continuous
+# month by month index. Any window total is then the difference of two entries, so quarterly, fiscal
+# year, trailing 12 month and cumulative reports all come from the same arrays without regrouping the
+# full table.
+#
+# Metrics:
+# * **rent**: collected rent
+# * **recoveries**: expense recoveries (only when the rent roll has been through calculateExpenses)
+# * **occupiedSF**: occupied SF summed over the months (SF-months), averaged in the period tables
+# * **leaseCount**: lease-months, averaged in the period tables
+#
+# Every cumulative array has a leading 0 so the total for months i through j is cum[j + 1] - cum[i].
+#
+# Month, quarter and fiscal keys come from the shared calendar in core.py, **_calendarTable_** shows it
+# as a DataFrame for joining other monthly tables on the same period numbers.
+
+#%%
+def newRollup(rent_roll):
+    full = rent_roll.full if hasattr(rent_roll, "full") else rent_roll
+
+    periods = core.period(full.index.values)
+    first = periods.min()
+    months = core.CALENDAR.month[first:periods.max() + 1]
+    position = periods - first
+
+    #monthly totals for every metric in one pass over the table each
+    monthly = {"rent": np.bincount(position, weights=full["collectedRent"].values, minlength=len(months)),
+               "occupiedSF": np.bincount(position, weights=full["occupiedSF"].values, minlength=len(months)),
+               "leaseCount": np.bincount(position, minlength=len(months)).astype(float)}
+    if "expenseAmount" in full:
+        monthly["recoveries"] = np.bincount(position, weights=full["expenseAmount"].values, minlength=len(months))
+
+    cumulative = {metric: np.concatenate([[0.0], np.cumsum(values)]) for metric, values in monthly.items()}
+
+    #creates a named tuple so the months and the running totals can be accessed easily
+
+    Rollup = namedtuple("Rollup", ["months", "cumulative"])
+    rollup = Rollup(months, cumulative)
+
+    return rollup
+
+#%%
+#the shared calendar between two dates as a table indexed by month end, period is the calendar row
+#every schedule month maps to (core.period) so other tables can be joined on it
+def calendarTable(start, end, fiscal_start_month=1):
+    periods = np.arange(core.period(pd.Timestamp(start)), core.period(pd.Timestamp(end)) + 1)
+    fiscal_year, fiscal_month = core.fiscal_period(periods, fiscal_start_month)
+    calendar = core.CALENDAR
+
+    table = pd.DataFrame({"period": periods,
+                          "days": calendar.days[periods],
+                          "year": calendar.year[periods],
+                          "quarter": calendar.quarter[periods],
+                          "month": calendar.monthOfYear[periods],
+                          "fiscalYear": fiscal_year,
+                          "fiscalMonth": fiscal_month},
+                         index=pd.DatetimeIndex(calendar.monthEnd[periods], name="monthEnd"))
+    return table
+
+#%%
+#position of a date in the rollup's months (negative before the first month)
+def _position(rollup, value):
+    return int((np.datetime64(pd.Timestamp(value), "M") - rollup.months[0]).astype(int))
+
+#%%
+#totals for every metric between two dates (both months included), SF and lease counts are averaged
+#over the rollup months in the window like the period tables, a window outside the rollup is all zeros
+def windowTotal(rollup, start, end):
+    months = len(rollup.months)
+    first = int(np.clip(_position(rollup, start), 0, months))
+    last = int(np.clip(_position(rollup, end) + 1, first, months))
+
+    table = pd.DataFrame({metric: [cum[last] - cum[first]] for metric, cum in rollup.cumulative.items()})
+    return _finish(table, np.array([last - first])).fillna(0).iloc[0]
+
+#%%
+#one row per period with the metric totals, rent PSF is annualized so periods of any length compare
+#period is "month", "quarter", "year" or "fiscal" (fiscal years start in fiscal_start_month and are
+#labeled by the calendar year they end in)
+def periodTotals(rollup, period="year", fiscal_start_month=1):
+    months = rollup.months
+    periods = core.period(months)
+    year = core.CALENDAR.year[periods]
+
+    if period == "month":
+        key = periods
+        labels = pd.DatetimeIndex(core.CALENDAR.monthEnd[periods])
+    elif period == "quarter":
+        key = year * 4 + core.CALENDAR.quarter[periods]
+        labels = pd.DatetimeIndex(months.astype("datetime64[D]")).to_period("Q")
+    elif period == "year":
+        key = year
+        labels = key
+    elif period == "fiscal":
+        key = core.fiscal_period(periods, fiscal_start_month)[0]
+        labels = key
+    else:
+        raise ValueError("period must be month, quarter, year or fiscal, not %r" % period)
+
+    #a period starts wherever the key changes, its totals are differences of the running totals
+    starts = np.flatnonzero(np.concatenate([[True], key[1:] != key[:-1]]))
+    ends = np.concatenate([starts[1:], [len(months)]])
+
+    table = pd.DataFrame({metric: cum[ends] - cum[starts] for metric, cum in rollup.cumulative.items()},
+                         index=pd.Index(np.asarray(labels)[starts], name=period))
+    return _finish(table, ends - starts)
+
+#%%
+#rolling totals ending at every month, e.g. trailing 12 months
+def trailingTotals(rollup, months=12):
+    ends = np.arange(1, len(rollup.months) + 1)
+    starts = np.maximum(ends - months, 0)
+
+    table = pd.DataFrame({metric: cum[ends] - cum[starts] for metric, cum in rollup.cumulative.items()},
+                         index=pd.DatetimeIndex(rollup.months.astype("datetime64[D]"), name="month") + pd.offsets.MonthEnd(0))
+    return _finish(table, ends - starts)
+
+#%%
+#running totals from the first month
+def cumulativeTotals(rollup):
+    table = pd.DataFrame({metric: cum[1:] for metric, cum in rollup.cumulative.items()},
+                         index=pd.DatetimeIndex(rollup.months.astype("datetime64[D]"), name="month") + pd.offsets.MonthEnd(0))
+    return _finish(table, np.arange(1, len(rollup.months) + 1))
+
+#%%
+#SF and lease counts are averaged over the months in each row, rent PSF is annualized
+def _finish(table, month_counts):
+    table["months"] = month_counts
+    table["occupiedSF"] = table["occupiedSF"] / month_counts
+    table["leaseCount"] = table["leaseCount"] / month_counts
+    with np.errstate(divide="ignore", invalid="ignore"):
+        table["rentPSF"] = np.where(table["occupiedSF"] > 0,
+                                    table["rent"] * 12 / month_counts / table["occupiedSF"], 0)
+    return table.round(2)
@@ -0,0 +1,175 @@
+#%%
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+
+from . import core
+from .leases import newLeaseBatch, newRentRoll, calculateExpenses
+from .cashflow import cashFlow
+
+#%% [markdown]
+# # Simulation Sweeps
+# ---
+# **_sweep_** runs a lease table through many (rent growth, interest rate) paths for scenario and Monte
+# Carlo runs. Paths are worked in chunks of chunk_size, each chunk's monthly series are built at the
+# chosen precision and only the summary metrics are kept, so peak memory follows the chunk size and not
+# the number of paths:
+# * **full**: float64 monthly series
+# * **float32**: float32 monthly series (half the memory, about 7 significant digits per month)
+# * **cents**: int64 cents (monthly figures worked out in float64 and stored in whole cents, so totals
+#   add up to the cent at any portfolio size)
+#
+# Sums are always accumulated in float64 (or int64 cents). Every chunk's metrics go to the reducer,
+# by default they're all collected into one table, **_MetricSummary_** keeps running statistics instead.
+# The reconcile_paths are run again in full precision, their figures replace the reduced ones and the
+# differences are returned with the results.
+#
+# Rent growth works like newLeaseSchedule's percent_increase (every 1/1 after the lease starts). The
+# loan is a level payment amortizing loan starting in the first month.
+
+PRECISIONS = {"full": np.float64, "float32": np.float32, "cents": np.int64}
+
+METRICS = ["totalRent", "totalNOI", "totalDebtService", "leveredCashFlow", "minDSCR", "leveredIRR"]
+
+#%%
+#running count, mean, standard deviation, min and max of each metric without keeping the paths.
+#Each chunk's mean and sum of squared deviations are merged into the running ones (Chan et al.), so
+#large money totals don't lose the spread to cancellation the way sum(x^2)/n - mean^2 does
+class MetricSummary:
+
+    def __init__(self):
+        self.counts = {}
+        self.means = {}
+        self.deviations = {}
+        self.low = {}
+        self.high = {}
+
+    def __call__(self, metrics):
+        for metric, values in metrics.items():
+            values = values.values.astype(np.float64)
+            values = values[np.isfinite(values)]
+            if not len(values):
+                continue
+            count, mean = self.counts.get(metric, 0), self.means.get(metric, 0.0)
+            chunk_mean = values.mean()
+            delta = chunk_mean - mean
+            total = count + len(values)
+
+            self.counts[metric] = total
+            self.means[metric] = mean + delta * len(values) / total
+            self.deviations[metric] = (self.deviations.get(metric, 0.0) + ((values - chunk_mean) ** 2).sum()
+                                       + delta ** 2 * count * len(values) / total)
+            self.low[metric] = min(self.low.get(metric, np.inf), values.min())
+            self.high[metric] = max(self.high.get(metric, -np.inf), values.max())
+
+    def result(self):
+        counts = pd.Series(self.counts, dtype=float)
+        table = pd.DataFrame({"paths": counts,
+                              "mean": pd.Series(self.means),
+                              "std": np.sqrt(pd.Series(self.deviations) / counts),
+                              "min": pd.Series(self.low),
+                              "max": pd.Series(self.high)})
+        table.index.name = "metric"
+        return table
+
+#%%
+#what every path shares: base rent by month and escalation year, recoveries, expenses and the loan term
+def _base(leases, expenses, building_size, expense_growth, expenses_year):
+    leases = leases.assign(percentIncrease=0.0)
+    schedule = newLeaseBatch(leases)
+    rentRoll = newRentRoll([schedule])
+    if building_size is not None:
+        calculateExpenses(rentRoll, expenses, building_size, percent_increase=expense_growth, expenses_year=expenses_year)
+    flows = cashFlow(rentRoll, expenses, expense_growth=expense_growth, expenses_year=expenses_year)
+
+    full = rentRoll.full
+    position = core.period(full.index.values) - core.period(flows.index[0])
+    escalations = (full.index.year - full["startYear"]).values
+    base_rent = np.zeros((escalations.max() + 1, len(flows)))
+    np.add.at(base_rent, (escalations, position), full["collectedRent"].values)
+
+    return base_rent, (flows["recoveries"] - flows["operatingExpenses"]).values, flows.index
+
+#%%
+#summary metrics of a chunk of paths with the monthly series held at precision
+def _paths(base_rent, other_income, growth_rates, interest_rates, principal, years, equity, metrics, precision):
+    dtype = PRECISIONS[precision]
+    work = np.float32 if precision == "float32" else np.float64
+    months = base_rent.shape[1]
+
+    #rent for every path is its growth factor for each escalation year times the base rent in that year
+    factors = (1 + growth_rates.astype(work)[:, None]) ** np.arange(base_rent.shape[0], dtype=work)
+    payment = core.payment(interest_rates / 12, years * 12, principal)
+    in_term = np.arange(months) < years * 12
+
+    rent = factors @ base_rent.astype(work)
+    noi = rent + other_income.astype(work)
+    debt = np.where(in_term, payment[:, None], 0).astype(work)
+    if precision == "cents":
+        rent, noi, debt = [np.round(series * 100).astype(dtype) for series in (rent, noi, debt)]
+    levered = noi - debt
+    scale = 100.0 if precision == "cents" else 1.0
+    total = np.int64 if precision == "cents" else np.float64
+
+    values = {"totalRent": lambda: rent.sum(axis=1, dtype=total) / scale,
+              "totalNOI": lambda: noi.sum(axis=1, dtype=total) / scale,
+              "totalDebtService": lambda: debt.sum(axis=1, dtype=total) / scale,
+              "leveredCashFlow": lambda: levered.sum(axis=1, dtype=total) / scale,
+              "minDSCR": lambda: np.where(in_term, noi / np.where(debt > 0, debt, 1), np.inf).min(axis=1)
+                                 if in_term.any() else np.full(len(rent), np.nan),
+              "leveredIRR": lambda: core.irr(np.column_stack([np.full(len(rent), -float(equity)), levered / scale]))}
+
+    return {metric: np.asarray(values[metric](), dtype=np.float64) for metric in metrics}
+
+#%%
+#growth_rates and interest_rates are one entry per path (or a single value for every path),
+#equity is only needed for leveredIRR (paid in the month before the first month)
+def sweep(leases, growth_rates, interest_rates, principal, years, expenses=0, building_size=None,
+          expense_growth=0.03, expenses_year=2019, equity=None, metrics=METRICS, precision="float32",
+          chunk_size=1000, reducer=None, reconcile_paths=(0,)):
+    if precision not in PRECISIONS:
+        raise ValueError("precision must be one of %s, not %r" % (", ".join(PRECISIONS), precision))
+    if not equity:
+        metrics = [metric for metric in metrics if metric != "leveredIRR"]
+
+    growth_rates, interest_rates = np.broadcast_arrays(np.asarray(growth_rates, dtype=float),
+                                                       np.asarray(interest_rates, dtype=float))
+    growth_rates, interest_rates = np.atleast_1d(growth_rates), np.atleast_1d(interest_rates)
+    base_rent, other_income, months = _base(leases, expenses, building_size, expense_growth, expenses_year)
+
+    #the reconciled paths are run in full precision up front so the reducer sees their exact figures
+    reconcile_paths = [path for path in reconcile_paths if path < len(growth_rates)]
+    exact = pd.DataFrame(_paths(base_rent, other_income, growth_rates[reconcile_paths], interest_rates[reconcile_paths],
+                                principal, years, equity, metrics, "full"), index=reconcile_paths)
+
+    collected = []
+    if reducer is None:
+        reducer = collected.append
+
+    reduced = []
+    for first in range(0, len(growth_rates), chunk_size):
+        chunk = slice(first, first + chunk_size)
+        table = pd.DataFrame(_paths(base_rent, other_income, growth_rates[chunk], interest_rates[chunk],
+                                    principal, years, equity, metrics, precision),
+                             index=pd.RangeIndex(first, first + len(growth_rates[chunk]), name="path"))
+        table.insert(0, "interestRate", interest_rates[chunk])
+        table.insert(0, "growthRate", growth_rates[chunk])
+
+        replaced = exact.index[(exact.index >= first) & (exact.index < first + len(table))]
+        reduced.append(table.loc[replaced, metrics])
+        table.loc[replaced, metrics] = exact.loc[replaced]
+        reducer(table)
+
+    reduced = pd.concat(reduced) if reduced else exact.iloc[0:0]
+    reconciliation = pd.DataFrame({"reduced": reduced.stack(), "full": exact.stack()})
+    reconciliation.index.names = ["path", "metric"]
+    reconciliation["difference"] = reconciliation["full"] - reconciliation["reduced"]
+
+    results = pd.concat(collected) if collected else getattr(reducer, "result", lambda: None)()
+
+    #creates a named tuple so the results and the full precision check can be accessed easily
+
+    Sweep = namedtuple("Sweep", ["results", "reconciliation", "months"])
+    sweep = Sweep(results, reconciliation, months)
+
+    return sweep
@@ -0,0 +1,116 @@
+#%%
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+
+from . import core
+
+#%% [markdown]
+# # Valuation
+# ---
+# **_dcfValuation_** values a deal from its annual NOI and loan for every combination of discount rate,
+# exit cap rate and hold period in one broadcast computation (discount rates x exit caps x hold years):
+# * **value**: NOI of each hold year and the net reversion discounted at the discount rate
+# * **reversion**: the year after the hold's NOI capitalized at the exit cap
+# * **saleCosts**: sale_cost share of the reversion
+# * **loanPayoff**: loan balance at the end of the hold
+# * **unleveredIRR** / **leveredIRR**: yearly IRRs of buying at purchase_price, levered with the loan
+#   funded at purchase and paid off from the sale
+#
+# noi is a Series of yearly NOI by year (or a cashFlow table, summed by calendar year), so the last hold
+# needs one more year of NOI for its reversion. Monthly NOI only counts calendar years with all 12 months,
+# a partial first or last year is dropped so it isn't valued as a full year. amortization is an amortization_table result, its debt
+# service and balance are lined up with the NOI years by calendar year.
+#
+#     dcfValuation(cashFlow(rentRoll, expenses), 10000000, amortization_table(7000000, 0.045, 25, start_date=date(2019, 1, 1)))
+
+#%%
+#yearly NOI by year from a Series or a cashFlow table, monthly NOI is summed over complete calendar years
+def _annual(noi):
+    if isinstance(noi, pd.DataFrame):
+        noi = noi["noi"]
+    if isinstance(noi.index, pd.DatetimeIndex):
+        periods = core.period(noi.index.values)
+        year = core.CALENDAR.year[periods]
+        months = pd.Series(periods).groupby(year).nunique()
+        complete = months.index[months.values == 12]
+
+        #only a partial first or last year can be dropped, a gap inside the hold would shift the years after it
+        gaps = months.index[(months.values < 12) & (months.index > complete.min()) & (months.index < complete.max())] \
+            if len(complete) else []
+        if len(gaps):
+            raise ValueError("NOI is missing months in %s" % ", ".join(str(missing) for missing in gaps))
+        noi = noi.groupby(year).sum().reindex(complete)
+    return noi.astype(float)
+
+#debt service and end of year balance in each NOI year
+def _debt(amortization, years):
+    schedule = amortization.schedule
+    year = core.CALENDAR.year[core.period(schedule["Month"].values)]
+    service = (schedule["Payment"] + schedule["Additional_Payment"]).groupby(year).sum()
+    balance = schedule["End Balance"].groupby(year).last()
+    loan = schedule["Begin Balance"].iloc[0] if len(schedule) else 0.0
+
+    #years after payoff carry the last (zero) balance
+    balance = balance.reindex(years).ffill().fillna(0.0)
+    return loan, service.reindex(years, fill_value=0.0).values, balance.values
+
+#%%
+def dcfValuation(noi, purchase_price, amortization=None, discount_rates=(0.07, 0.08, 0.09),
+                 exit_caps=(0.06, 0.065, 0.07), hold_years=(5, 7, 10), sale_cost=0.02):
+    noi = _annual(noi)
+    discount_rates = np.atleast_1d(np.asarray(discount_rates, dtype=float))
+    exit_caps = np.atleast_1d(np.asarray(exit_caps, dtype=float))
+    hold_years = np.atleast_1d(np.asarray(hold_years, dtype=int))
+    if hold_years.min() < 1 or hold_years.max() >= len(noi):
+        raise ValueError("hold years must be between 1 and %d, there are %d complete NOI years and the last is "
+                         "needed for the reversion" % (len(noi) - 1, len(noi)))
+
+    #hold year t is NOI year t - 1, so noi[hold] is the forward NOI capitalized at exit
+    horizon = hold_years.max()
+    t = np.arange(1, horizon + 1)
+    annual = noi.values[:horizon]
+    held = t <= hold_years[:, None]
+    sold = t == hold_years[:, None]
+
+    loan, service, balance = 0.0, np.zeros(horizon), np.zeros(horizon)
+    if amortization is not None:
+        loan, service, balance = _debt(amortization, noi.index.values[:horizon])
+
+    #exit caps x holds
+    reversion = noi.values[hold_years] / exit_caps[:, None]
+    sale_costs = reversion * sale_cost
+    payoff = balance[hold_years - 1]
+    proceeds = reversion - sale_costs
+
+    #discount rates x exit caps x holds
+    discount = (1 + discount_rates[:, None]) ** -t
+    value = ((discount * annual) @ held.T)[:, None, :] + proceeds[None] * discount[:, hold_years - 1][:, None, :]
+
+    #exit caps x holds x years, with the purchase in year 0
+    unlevered = np.zeros((len(exit_caps), len(hold_years), horizon + 1))
+    unlevered[..., 0] = -purchase_price
+    unlevered[..., 1:] = annual * held + proceeds[..., None] * sold
+    levered = unlevered.copy()
+    levered[..., 0] += loan
+    levered[..., 1:] -= service * held + payoff[:, None] * sold
+
+    grid = pd.DataFrame({"value": value.ravel(),
+                         "reversion": np.broadcast_to(reversion, value.shape).ravel(),
+                         "saleCosts": np.broadcast_to(sale_costs, value.shape).ravel(),
+                         "loanPayoff": np.broadcast_to(payoff, value.shape).ravel(),
+                         "netProceeds": np.broadcast_to(proceeds - payoff, value.shape).ravel(),
+                         "unleveredIRR": np.broadcast_to(core.irr(unlevered, periods_per_year=1), value.shape).ravel(),
+                         "leveredIRR": np.broadcast_to(core.irr(levered, periods_per_year=1), value.shape).ravel()},
+                        index=pd.MultiIndex.from_product([discount_rates, exit_caps, hold_years],
+                                                         names=["discountRate", "exitCap", "holdYears"]))
+
+    #value by hold and discount rate down the side and exit cap across the top
+    table = grid["value"].unstack("exitCap").reorder_levels(["holdYears", "discountRate"]).sort_index()
+
+    #creates a named tuple so the full grid and the sensitivity table can be accessed easily
+
+    Valuation = namedtuple("Valuation", ["grid", "table"])
+    valuation = Valuation(grid.round({column: 4 if column.endswith("IRR") else 2 for column in grid}), table.round(2))
+
+    return valuation
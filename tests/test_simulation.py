@@ -0,0 +1,28 @@
+import numpy as np
+
+from Functions.benchmarks import syntheticLeases
+from Functions.ingest import validateLeases
+from Functions import simulation
+
+def portfolio_leases(lease_count):
+    leases = syntheticLeases(lease_count).rename(columns={"tenant_name": "tenantName", "occupied_sf": "occupiedSF",
+                                                          "rental_rate_psf": "rentalRate", "expense_type": "expenseType",
+                                                          "start_date": "startDate", "end_date": "endDate",
+                                                          "percent_increase": "percentIncrease"})
+    return validateLeases(leases)[0]
+
+
+#a few thousand leases bring in more than the 2**31 cents an int32 month can hold
+def test_cents_totals_hold_at_portfolio_scale():
+    leases = portfolio_leases(3000)
+    growth_rates, interest_rates = [0.0, 0.02, 0.04], [0.04, 0.05, 0.06]
+
+    base_rent, other_income, months = simulation._base(leases, 0, None, 0.03, 2019)
+    assert base_rent.sum(axis=0).max() * 100 > np.iinfo(np.int32).max
+
+    full = simulation.sweep(leases, growth_rates, interest_rates, 2e9, 10, precision="full", reconcile_paths=())
+    cents = simulation.sweep(leases, growth_rates, interest_rates, 2e9, 10, precision="cents", reconcile_paths=())
+
+    for metric in ["totalRent", "totalNOI", "totalDebtService", "leveredCashFlow"]:
+        np.testing.assert_allclose(cents.results[metric], full.results[metric], atol=len(months) * 0.01)
+    np.testing.assert_allclose(cents.results["minDSCR"], full.results["minDSCR"], rtol=1e-6)
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from Functions import core
+
+HURDLES = (0.08, 0.12)
+SPLITS = (0.9, 0.8, 0.7)
+
+#one scenario a period at a time: what the LP is owed at each hurdle grows monthly and every LP
+#distribution from any tier pays it down
+def reference_waterfall(flows, hurdles, splits, lp_share, periods_per_year=12):
+    owed = [0.0] * len(hurdles)
+    tiers = np.zeros((len(splits), len(flows)))
+    for period, flow in enumerate(flows):
+        for tier, hurdle in enumerate(hurdles):
+            owed[tier] = owed[tier] * (1 + hurdle) ** (1 / periods_per_year) + max(-flow, 0) * lp_share
+        remaining, paid = max(flow, 0), 0.0
+        for tier, hurdle in enumerate(hurdles):
+            cash = min(remaining, max(owed[tier] - paid, 0) / splits[tier])
+            tiers[tier, period] = cash
+            paid += cash * splits[tier]
+            remaining -= cash
+        tiers[-1, period] = remaining
+        paid += remaining * splits[-1]
+        owed = [balance - paid for balance in owed]
+    return tiers
+
+
+def capital_call_after_distribution():
+    flows = np.zeros(25)
+    flows[0], flows[6], flows[12], flows[24] = -1e6, 1.5e6, -1e6, 1.5e6
+    return flows
+
+
+def test_capital_call_after_distribution_counts_promote_cash():
+    flows = capital_call_after_distribution()
+    split = core.waterfall(flows, HURDLES, SPLITS, 0.9)
+
+    assert split.tiers[0, 24] == pytest.approx(675094, abs=1)
+
+    #at the close of tier 1 the LP is exactly at the first hurdle
+    lp = -np.maximum(-flows, 0) * 0.9 + split.lp
+    lp[24] = split.tiers[0, 24] * SPLITS[0]
+    assert core.irr(lp) == pytest.approx(0.08, abs=1e-6)
+
+
+def test_matches_reference_loop():
+    random = np.random.default_rng(7)
+    flows = random.normal(0, 1e5, (200, 60)) * (random.random((200, 60)) < 0.3)
+    flows[:, 0] = -random.uniform(5e5, 2e6, 200)
+    flows[:, -1] += random.uniform(0, 3e6, 200)
+
+    split = core.waterfall(flows, HURDLES, SPLITS, 0.9)
+    for row in range(len(flows)):
+        np.testing.assert_allclose(split.tiers[:, row], reference_waterfall(flows[row], HURDLES, SPLITS, 0.9),
+                                   atol=1e-6)
+    np.testing.assert_allclose(split.lp + split.gp, np.maximum(flows, 0), atol=1e-6)